@@ -0,0 +1,49 @@
+"""Real-time notification API routes."""
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.db.database import DbSession, get_db, release_db_connection
+from app.services.auth_service import get_current_user_for_stream
+from app.services.event_service import event_hub, iter_event_stream, TooManySubscriptionsError
+from app.db.tables import User
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+
+@router.get("")
+async def stream_events(
+    current_user: User = Depends(get_current_user_for_stream),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Stream the user's file events (created, updated, deleted) as Server-Sent Events.
+
+    Authenticate with the usual Bearer header, or an access_token query parameter
+    for EventSource. Each event's data is JSON with the affected fileIds (and the
+    files' metadata unless deleted). An "overflow" event means events were dropped;
+    catch up from the change feed and reconnect.
+    """
+    try:
+        subscription = event_hub.subscribe(current_user.id)
+    except TooManySubscriptionsError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"At most {settings.EVENTS_MAX_CONNECTIONS_PER_USER} event streams per user"
+        )
+    
+    # The stream may stay open for a long time; don't pin a pooled connection to it
+    await release_db_connection(db)
+    logger.info(f"Event stream opened for user_id={current_user.id}")
+    
+    return StreamingResponse(
+        iter_event_stream(subscription),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -1,22 +1,95 @@
 """File management API routes."""
-import uuid
-from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile, Query
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-
-from app.db.database import get_db
-from app.models import FileInfo, FileListResponse, FileUploadResponse, FileDeleteResponse
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    status,
+    UploadFile,
+    File as FastAPIFile,
+    Query
+)
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.db.database import DbSession, get_db, run_db, release_db_connection
+from app.models import (
+    FileInfo,
+    FileListResponse,
+    FileUploadResponse,
+    FileDeleteResponse,
+    BlobCheckResponse,
+    FileFromHashRequest,
+    BatchFileError,
+    BatchUploadResponse,
+    BatchFileIdsRequest,
+    BatchDeleteResponse,
+    BatchMetadataResponse,
+    FileSignatureResponse,
+    FileChangeInfo,
+    FileChangesResponse,
+    UsageResponse,
+    FileSearchResponse
+)
 from app.services.file_service import (
-    create_file_metadata,
-    get_file_metadata_by_id,
+    save_file_record,
+    create_file_records,
+    get_file_for_user,
+    get_user_files_by_ids,
     get_user_files_count,
     get_user_files,
-    get_user_file_association,
-    create_user_file_association,
-    delete_file_and_association
+    search_user_files,
+    encode_file_cursor,
+    decode_file_cursor,
+    tombstone_user_files,
+    replace_file_content
+)
+from app.services.change_service import (
+    change_notifier,
+    get_change_cursor,
+    get_changes,
+    is_cursor_expired
 )
+from app.services.usage_service import get_usage, QuotaExceededError
+from app.services.search_service import build_match_query
 from app.services.auth_service import get_current_user
+from app.services.upload_service import save_upload_file, FileTooLargeError
+from app.services.download_service import (
+    build_file_response,
+    content_disposition,
+    get_last_modified,
+    is_not_modified,
+    make_etag
+)
+from app.services.thumbnail_service import (
+    get_thumbnail,
+    get_preview_key,
+    schedule_previews,
+    THUMBNAIL_MEDIA_TYPE
+)
+from app.services.delta_service import (
+    apply_delta,
+    compute_signature,
+    discard_replaced_content,
+    get_block_size,
+    DeltaFormatError,
+    WEAK_HASH,
+    STRONG_HASH
+)
+from app.services.archive_service import build_archive_entries, iter_zip_archive, archive_filename
+from app.services.blob_service import (
+    new_staging_path,
+    get_blob_locator,
+    place_blob,
+    drop_blob_references,
+    reserve_owned_blob,
+    content_exists,
+    user_has_blob
+)
 from app.db.tables import User
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -26,44 +99,67 @@ logger = get_logger(__name__)
 router = APIRouter(prefix="/api/files", tags=["Files"])
 
 
+def _quota_exceeded() -> HTTPException:
+    """Build the error returned when a write doesn't fit the user's storage quota."""
+    return HTTPException(
+        status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+        detail="Storage quota exceeded"
+    )
+
+
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert an aware datetime to the naive UTC form timestamps are stored in."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def _check_quota(db: DbSession, user_id: int, size: int, count: int = 1) -> None:
+    """Reject an upload up front if it can't fit the user's quota (re-checked when it is recorded)."""
+    usage = await run_db(db, get_usage, user_id)
+    if not usage.allows(size, count):
+        raise _quota_exceeded()
+
+
 @router.post("/upload", response_model=FileUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     file: UploadFile = FastAPIFile(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
     """Upload a file for the authenticated user."""
+    # Multipart parts are spooled by the framework; check the quota before storing the blob
+    await _check_quota(db, current_user.id, file.size or 0)
+    
     try:
-        # Create user-specific directory
-        user_dir = settings.uploads_path / str(current_user.id)
-        user_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Generate unique filename to avoid collisions
-        file_extension = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = user_dir / unique_filename
-        
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream file to a staging path, hashing content as it arrives
+        stored = await save_upload_file(file, new_staging_path(), compute_hash=True)
         
         # Get file size and type
-        file_size = len(content)
+        file_size = stored.size
         file_type = file.content_type or "application/octet-stream"
         
-        # Create file metadata in database
-        db_file = create_file_metadata(
-            db=db,
-            fileName=file.filename,
-            fileType=file_type,
-            fileSize=file_size,
-            filePath=str(file_path)
-        )
+        # Move content into the blob store (or reuse an identical blob), holding a reference on it
+        placed = await place_blob(db, stored.path, stored.sha256)
         
-        # Create user-file association
-        create_user_file_association(db, current_user.id, db_file.id)
+        # Record file metadata and user association in one commit, taking over the reference
+        try:
+            db_file = await save_file_record(
+                db,
+                current_user.id,
+                fileName=file.filename,
+                fileType=file_type,
+                fileSize=file_size,
+                filePath=placed.locator,
+                blobHash=stored.sha256,
+                contentEncoding=placed.encoding,
+                storedSize=placed.stored_size
+            )
+        except BaseException:
+            await drop_blob_references(db, [stored.sha256])
+            raise
         
+        schedule_previews(db_file)
         logger.info(f"File uploaded: {file.filename} by user_id={current_user.id}")
         
         return FileUploadResponse(
@@ -75,6 +171,15 @@ async def upload_file(
             message="File uploaded successfully"
         )
     
+    except FileTooLargeError as e:
+        logger.warning(f"Upload rejected: {file.filename} by user_id={current_user.id} - {e}")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds maximum size of {settings.MAX_FILE_SIZE_MB} MB"
+        )
+    except QuotaExceededError:
+        logger.warning(f"Upload rejected: {file.filename} by user_id={current_user.id} - quota exceeded")
+        raise _quota_exceeded()
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(
@@ -83,42 +188,401 @@ async def upload_file(
         )
 
 
+@router.get("/blobs/{sha256}", response_model=BlobCheckResponse)
+async def check_blob(
+    sha256: str,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Check whether one of the user's files already has this content, so a copy can skip uploading it."""
+    sha256 = sha256.lower()
+    return BlobCheckResponse(sha256=sha256, exists=await run_db(db, user_has_blob, current_user.id, sha256))
+
+
+@router.post("/from-hash", response_model=FileUploadResponse, status_code=status.HTTP_201_CREATED)
+async def create_file_from_hash(
+    data: FileFromHashRequest,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Create a file that references content the user already stores, without uploading its bytes.
+
+    Only content in one of the caller's own files qualifies; knowing another
+    user's hash and size must not be enough to obtain a copy of their file.
+    """
+    reserved = await run_db(db, reserve_owned_blob, current_user.id, data.sha256, data.fileSize)
+    if reserved is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found; upload the file instead"
+        )
+    
+    content_encoding, stored_size = reserved
+    try:
+        try:
+            db_file = await save_file_record(
+                db,
+                current_user.id,
+                fileName=data.fileName,
+                fileType=data.fileType,
+                fileSize=data.fileSize,
+                filePath=get_blob_locator(data.sha256),
+                blobHash=data.sha256,
+                contentEncoding=content_encoding,
+                storedSize=stored_size
+            )
+        except BaseException:
+            await drop_blob_references(db, [data.sha256])
+            raise
+    except QuotaExceededError:
+        raise _quota_exceeded()
+    
+    logger.info(f"File created from existing blob: {data.fileName} by user_id={current_user.id}")
+    
+    return FileUploadResponse(
+        id=db_file.id,
+        fileName=db_file.fileName,
+        fileType=db_file.fileType,
+        fileSize=db_file.fileSize,
+        filePath=db_file.filePath,
+        message="File created from existing content"
+    )
+
+
+@router.post("/batch/upload", response_model=BatchUploadResponse, status_code=status.HTTP_201_CREATED)
+async def batch_upload_files(
+    files: List[UploadFile] = FastAPIFile(...),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Upload several files in one multipart request, recording them in a single transaction."""
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_MAX_FILES} files can be uploaded per request"
+        )
+    await _check_quota(db, current_user.id, sum(file.size or 0 for file in files), len(files))
+    
+    # Stream each part to disk in turn; a failed part doesn't abort the rest
+    records = []
+    errors = []
+    for file in files:
+        try:
+            stored = await save_upload_file(file, new_staging_path(), compute_hash=True)
+            placed = await place_blob(db, stored.path, stored.sha256)
+        except FileTooLargeError:
+            errors.append(BatchFileError(
+                fileName=file.filename,
+                detail=f"File exceeds maximum size of {settings.MAX_FILE_SIZE_MB} MB"
+            ))
+            continue
+        except Exception as e:
+            logger.error(f"Error storing batch upload part {file.filename}: {str(e)}")
+            errors.append(BatchFileError(fileName=file.filename, detail=f"Error uploading file: {str(e)}"))
+            continue
+        records.append({
+            "fileName": file.filename,
+            "fileType": file.content_type or "application/octet-stream",
+            "fileSize": stored.size,
+            "filePath": placed.locator,
+            "blobHash": stored.sha256,
+            "contentEncoding": placed.encoding,
+            "storedSize": placed.stored_size,
+        })
+    
+    db_files = []
+    if records:
+        try:
+            try:
+                db_files = await run_db(db, create_file_records, current_user.id, records)
+            except BaseException:
+                await drop_blob_references(db, [record["blobHash"] for record in records])
+                raise
+        except QuotaExceededError:
+            raise _quota_exceeded()
+        except Exception as e:
+            logger.error(f"Error recording batch upload: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error uploading files: {str(e)}"
+            )
+    
+    for db_file in db_files:
+        schedule_previews(db_file)
+    logger.info(f"Batch uploaded {len(db_files)} files ({len(errors)} failed) by user_id={current_user.id}")
+    
+    return BatchUploadResponse(
+        files=[
+            FileUploadResponse(
+                id=db_file.id,
+                fileName=db_file.fileName,
+                fileType=db_file.fileType,
+                fileSize=db_file.fileSize,
+                filePath=db_file.filePath,
+                message="File uploaded successfully"
+            )
+            for db_file in db_files
+        ],
+        errors=errors
+    )
+
+
+@router.post("/batch/delete", response_model=BatchDeleteResponse)
+async def batch_delete_files(
+    data: BatchFileIdsRequest,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Delete many files in one transaction; their content is reclaimed by the garbage collector."""
+    file_ids = list(dict.fromkeys(data.ids))
+    deleted_ids = await run_db(db, tombstone_user_files, current_user.id, file_ids)
+    
+    deleted = set(deleted_ids)
+    logger.info(f"Batch deleted {len(deleted_ids)} files by user_id={current_user.id}")
+    
+    return BatchDeleteResponse(
+        deleted=deleted_ids,
+        not_found=[file_id for file_id in file_ids if file_id not in deleted],
+        message=f"Deleted {len(deleted_ids)} files"
+    )
+
+
+@router.post("/batch/metadata", response_model=BatchMetadataResponse)
+async def batch_get_metadata(
+    data: BatchFileIdsRequest,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Get metadata for many of the user's files in one query."""
+    file_ids = list(dict.fromkeys(data.ids))
+    files = await run_db(db, get_user_files_by_ids, current_user.id, file_ids)
+    found = {f.id for f in files}
+    
+    return BatchMetadataResponse(
+        files=[FileInfo.model_validate(f) for f in files],
+        not_found=[file_id for file_id in file_ids if file_id not in found]
+    )
+
+
+@router.post("/archive")
+async def download_archive(
+    data: BatchFileIdsRequest,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Download many files as a ZIP archive streamed as it is built."""
+    file_ids = list(dict.fromkeys(data.ids))
+    
+    # Check ownership of every requested file in one query
+    files = await run_db(db, get_user_files_by_ids, current_user.id, file_ids)
+    found = {f.id for f in files}
+    missing = [file_id for file_id in file_ids if file_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Files not found: {missing}"
+        )
+    
+    # Keep the caller's order in the archive
+    order = {file_id: i for i, file_id in enumerate(file_ids)}
+    files.sort(key=lambda f: order[f.id])
+    
+    logger.info(f"Archive download of {len(files)} files by user_id={current_user.id}")
+    
+    return StreamingResponse(
+        iter_zip_archive(build_archive_entries(files)),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": content_disposition(archive_filename(files)),
+            "Cache-Control": "no-store",
+        }
+    )
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_storage_usage(
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Get the user's storage usage and quota from the materialized counters."""
+    usage = await run_db(db, get_usage, current_user.id)
+    return UsageResponse(
+        bytesUsed=usage.bytesUsed,
+        fileCount=usage.fileCount,
+        quotaBytes=usage.quotaBytes or None,
+        quotaFiles=usage.quotaFiles or None,
+        bytesRemaining=usage.bytesRemaining
+    )
+
+
 @router.get("/", response_model=FileListResponse)
-def list_files(
-    page: int = Query(1, ge=1, description="Page number"),
+async def list_files(
+    page: int = Query(1, ge=1, description="Page number (ignored when cursor is given)"),
     page_size: int = Query(10, ge=1, le=100, description="Files per page"),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page"),
+    sort: Literal["created", "name", "size"] = Query("created", description="Sort column"),
+    order: Literal["asc", "desc"] = Query("asc", description="Sort direction"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
-    """List all files for the authenticated user with pagination."""
+    """List all files for the authenticated user with offset or keyset (cursor) pagination."""
+    after = None
+    if cursor:
+        try:
+            after = decode_file_cursor(cursor, sort, order)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: {str(e)}"
+            )
+    
     # Get total count
-    total = get_user_files_count(db, current_user.id)
+    total = await run_db(db, get_user_files_count, current_user.id)
     
     # Get files for current page
-    files = get_user_files(db, current_user.id, page, page_size)
+    files = await run_db(db, get_user_files, current_user.id, page, page_size, sort, order, after)
     
     # Convert to FileInfo schema
     file_infos = [FileInfo.model_validate(f) for f in files]
+    next_cursor = encode_file_cursor(files[-1], sort, order) if len(files) == page_size else None
     
-    logger.info(f"Listed {len(file_infos)} files for user_id={current_user.id}, page={page}")
+    logger.info(f"Listed {len(file_infos)} files for user_id={current_user.id}, page={page}, cursor={bool(cursor)}")
     
     return FileListResponse(
         files=file_infos,
         total=total,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/search", response_model=FileSearchResponse)
+async def search_files(
+    q: Optional[str] = Query(None, max_length=200, description="Words to find in file names (prefix match)"),
+    type: Optional[str] = Query(None, max_length=100, description='MIME type or prefix, e.g. "image/"'),
+    min_size: Optional[int] = Query(None, ge=0, description="Minimum size in bytes"),
+    max_size: Optional[int] = Query(None, ge=0, description="Maximum size in bytes"),
+    created_after: Optional[datetime] = Query(None, description="Created at or after (UTC)"),
+    created_before: Optional[datetime] = Query(None, description="Created before (UTC)"),
+    sort: Literal["created", "name", "size"] = Query("created", description="Sort column"),
+    order: Literal["asc", "desc"] = Query("asc", description="Sort direction"),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page"),
+    limit: int = Query(50, ge=1, le=200, description="Files per page"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Search the user's files by name (full-text) and filter by type, size and creation date."""
+    after = None
+    if cursor:
+        try:
+            after = decode_file_cursor(cursor, sort, order)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: {str(e)}"
+            )
+    
+    match = None
+    if q:
+        match = build_match_query(q)
+        if match is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Search query has no searchable words"
+            )
+    
+    files = await run_db(
+        db,
+        search_user_files,
+        current_user.id,
+        match=match,
+        file_type=type.strip().lower() if type else None,
+        min_size=min_size,
+        max_size=max_size,
+        created_after=_as_naive_utc(created_after),
+        created_before=_as_naive_utc(created_before),
+        sort=sort,
+        order=order,
+        cursor=after,
+        limit=limit
+    )
+    next_cursor = encode_file_cursor(files[-1], sort, order) if len(files) == limit else None
+    
+    logger.info(f"Search returned {len(files)} files for user_id={current_user.id}")
+    
+    return FileSearchResponse(
+        files=[FileInfo.model_validate(f) for f in files],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/changes", response_model=FileChangesResponse)
+async def get_file_changes(
+    cursor: Optional[int] = Query(None, ge=0, description="Cursor from a previous response; omit to get the current position"),
+    limit: int = Query(settings.CHANGE_FEED_PAGE_SIZE, ge=1, le=1000, description="Maximum journal entries to read"),
+    wait: int = Query(0, ge=0, le=settings.CHANGE_FEED_MAX_WAIT_SECONDS, description="Seconds to long-poll when there are no changes"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Get the user's file changes since a cursor, instead of re-listing every file.
+
+    Without a cursor, returns the current position to start from (take it before
+    a full listing). With wait, a request that finds nothing parks until a change
+    is committed or the timeout passes, holding no database connection meanwhile.
+    """
+    if cursor is None:
+        position = await run_db(db, get_change_cursor, current_user.id)
+        return FileChangesResponse(changes=[], cursor=position, has_more=False)
+    
+    if await run_db(db, is_cursor_expired, cursor):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Cursor has expired; list files again and start from a new cursor"
+        )
+    
+    # Subscribe before reading so a change committed in between still wakes us
+    waiter = change_notifier.subscribe(current_user.id) if wait else None
+    try:
+        entries, next_cursor, has_more = await run_db(db, get_changes, current_user.id, cursor, limit)
+        if not entries and waiter is not None:
+            await release_db_connection(db)
+            try:
+                await asyncio.wait_for(waiter, wait)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                entries, next_cursor, has_more = await run_db(db, get_changes, current_user.id, cursor, limit)
+    finally:
+        if waiter is not None:
+            change_notifier.unsubscribe(current_user.id, waiter)
+    
+    return FileChangesResponse(
+        changes=[
+            FileChangeInfo(
+                fileId=entry.fileId,
+                action=entry.action,
+                file=FileInfo.model_validate(entry.file) if entry.file is not None else None
+            )
+            for entry in entries
+        ],
+        cursor=next_cursor,
+        has_more=has_more
     )
 
 
 @router.get("/{file_id}/download")
-def download_file(
+async def download_file(
+    request: Request,
     file_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
-    """Download a file by ID."""
-    # Get file metadata
-    file_metadata = get_file_metadata_by_id(db, file_id)
+    """Download a file by ID, supporting Range and conditional (ETag/Last-Modified) requests."""
+    # Get file metadata and ownership in one query
+    file_metadata, is_owner = await run_db(db, get_file_for_user, current_user.id, file_id)
     
     if not file_metadata:
         raise HTTPException(
@@ -127,42 +591,282 @@ def download_file(
         )
     
     # Check if file belongs to the user
-    association = get_user_file_association(db, current_user.id, file_id)
-    if not association:
+    if not is_owner:
         logger.warning(f"Unauthorized file access attempt: file_id={file_id} by user_id={current_user.id}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to access this file"
         )
     
-    # Check if file exists on disk
-    file_path = Path(file_metadata.filePath)
-    if not file_path.exists():
-        logger.error(f"File not found on disk: {file_path}")
+    # Check that the content is still in storage
+    if not await run_in_threadpool(content_exists, file_metadata.blobHash, file_metadata.filePath):
+        logger.error(f"File content not found in storage: {file_metadata.filePath}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="File not found on disk"
+            detail="File content not found"
         )
     
     logger.info(f"File downloaded: {file_metadata.fileName} by user_id={current_user.id}")
     
-    # Return file as response
-    return FileResponse(
-        path=file_path,
-        filename=file_metadata.fileName,
-        media_type=file_metadata.fileType
+    # Return full, partial or not-modified response
+    return build_file_response(request, file_metadata)
+
+
+@router.get("/{file_id}/thumbnail")
+async def get_file_thumbnail(
+    request: Request,
+    file_id: int,
+    size: int = Query(settings.THUMBNAIL_DEFAULT_SIZE, description=f"Preview size in pixels, one of {settings.THUMBNAIL_SIZES}"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Get a JPEG preview of an image or PDF, generating it on first request."""
+    if size not in settings.THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Size must be one of {settings.THUMBNAIL_SIZES}"
+        )
+    
+    # Get file metadata and ownership in one query
+    file_metadata, is_owner = await run_db(db, get_file_for_user, current_user.id, file_id)
+    
+    if not file_metadata:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    if not is_owner:
+        logger.warning(f"Unauthorized thumbnail access attempt: file_id={file_id} by user_id={current_user.id}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to access this file"
+        )
+    
+    etag = f'"{get_preview_key(file_metadata)}-{size}"'
+    last_modified = get_last_modified(file_metadata)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=86400",
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    thumbnail_path = await get_thumbnail(file_metadata, size)
+    if thumbnail_path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No preview available for this file"
+        )
+    
+    return FileResponse(thumbnail_path, media_type=THUMBNAIL_MEDIA_TYPE, headers=headers)
+
+
+@router.get("/{file_id}/signature", response_model=FileSignatureResponse)
+async def get_file_signature(
+    file_id: int,
+    block_size: Optional[int] = Query(
+        None,
+        ge=512,
+        le=settings.delta_max_block_size_bytes,
+        description="Block size in bytes (server default if omitted)"
+    ),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Get rolling-checksum block signatures of a file's content, so a client can upload only what changed."""
+    # Get file metadata and ownership in one query
+    file_metadata, is_owner = await run_db(db, get_file_for_user, current_user.id, file_id)
+    
+    if not file_metadata:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    if not is_owner:
+        logger.warning(f"Unauthorized signature access attempt: file_id={file_id} by user_id={current_user.id}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to access this file"
+        )
+    
+    if not await run_in_threadpool(content_exists, file_metadata.blobHash, file_metadata.filePath):
+        logger.error(f"File content not found in storage: {file_metadata.filePath}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File content not found"
+        )
+    
+    block_size = get_block_size(file_metadata.fileSize, block_size)
+    blocks = await run_in_threadpool(compute_signature, file_metadata, block_size)
+    
+    return FileSignatureResponse(
+        fileId=file_metadata.id,
+        etag=make_etag(file_metadata),
+        fileSize=file_metadata.fileSize,
+        blockSize=block_size,
+        weakHash=WEAK_HASH,
+        strongHash=STRONG_HASH,
+        blocks=blocks
+    )
+
+
+@router.post("/{file_id}/delta", response_model=FileUploadResponse)
+async def apply_file_delta(
+    request: Request,
+    file_id: int,
+    block_size: int = Query(
+        ...,
+        ge=512,
+        le=settings.delta_max_block_size_bytes,
+        description="Block size of the signature the delta was built from"
+    ),
+    sha256: Optional[str] = Query(None, pattern="^[0-9a-f]{64}$", description="Expected SHA-256 of the new content"),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """
+    Update a file's content from an rsync-style delta in the raw request body.
+
+    The delta is a stream of COPY (base block range) and LITERAL (new bytes) ops
+    ending in END; see app.services.delta_service for the encoding. If-Match must
+    carry the ETag from the signature, and the new version replaces the old one
+    atomically only if the file hasn't changed since.
+    """
+    # Get file metadata and ownership in one query
+    file_metadata, is_owner = await run_db(db, get_file_for_user, current_user.id, file_id)
+    
+    if not file_metadata:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    if not is_owner:
+        logger.warning(f"Unauthorized file update attempt: file_id={file_id} by user_id={current_user.id}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to modify this file"
+        )
+    
+    if_match = request.headers.get("if-match")
+    if not if_match:
+        raise HTTPException(
+            status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+            detail="If-Match with the ETag of the signed version is required"
+        )
+    if if_match.strip() != make_etag(file_metadata):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="File has changed since its signature was taken"
+        )
+    
+    if not await run_in_threadpool(content_exists, file_metadata.blobHash, file_metadata.filePath):
+        logger.error(f"File content not found in storage: {file_metadata.filePath}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File content not found"
+        )
+    
+    # The swap below refreshes file_metadata, so keep the base version's location
+    base_hash, base_path = file_metadata.blobHash, file_metadata.filePath
+    max_bytes = settings.delta_max_file_size_bytes
+    capped_by_quota = False
+    usage = await run_db(db, get_usage, current_user.id)
+    if usage.bytesRemaining is not None:
+        # The new version may grow by at most the remaining quota
+        quota_bytes = file_metadata.fileSize + usage.bytesRemaining
+        if quota_bytes < max_bytes:
+            max_bytes = quota_bytes
+            capped_by_quota = True
+    # Don't hold a pooled connection while the client streams the delta
+    await release_db_connection(db)
+    try:
+        # Rebuild the new version in staging from base blocks and literal data
+        stored = await apply_delta(file_metadata, request.stream(), block_size, new_staging_path(), max_bytes)
+    except DeltaFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid delta: {str(e)}"
+        )
+    except FileTooLargeError:
+        if capped_by_quota:
+            raise _quota_exceeded()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds maximum size of {settings.DELTA_MAX_FILE_SIZE_MB} MB"
+        )
+    
+    if sha256 and stored.sha256 != sha256:
+        await run_in_threadpool(stored.path.unlink, True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Reconstructed content does not match the expected SHA-256"
+        )
+    
+    try:
+        placed = await place_blob(db, stored.path, stored.sha256)
+        
+        # Swap the file onto the new blob only if it still has the base content
+        try:
+            result = await run_db(
+                db,
+                replace_file_content,
+                current_user.id,
+                file_id,
+                base_hash,
+                base_path,
+                fileSize=stored.size,
+                filePath=placed.locator,
+                blobHash=stored.sha256,
+                contentEncoding=placed.encoding,
+                storedSize=placed.stored_size
+            )
+        except BaseException:
+            await drop_blob_references(db, [stored.sha256])
+            raise
+        if result is None:
+            await drop_blob_references(db, [stored.sha256])
+    except QuotaExceededError:
+        raise _quota_exceeded()
+    except Exception as e:
+        logger.error(f"Error applying delta to file_id={file_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating file: {str(e)}"
+        )
+    
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="File has changed since its signature was taken"
+        )
+    
+    db_file, unreferenced = result
+    await run_in_threadpool(discard_replaced_content, file_id, base_hash, base_path, unreferenced)
+    schedule_previews(db_file)
+    logger.info(f"File updated from delta: file_id={file_id} ({stored.size} bytes) by user_id={current_user.id}")
+    
+    return FileUploadResponse(
+        id=db_file.id,
+        fileName=db_file.fileName,
+        fileType=db_file.fileType,
+        fileSize=db_file.fileSize,
+        filePath=db_file.filePath,
+        message="File updated successfully"
     )
 
 
 @router.delete("/{file_id}", response_model=FileDeleteResponse)
-def delete_file(
+async def delete_file(
     file_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ):
     """Delete a file by ID."""
-    # Get file metadata
-    file_metadata = get_file_metadata_by_id(db, file_id)
+    # Get file metadata and ownership in one query
+    file_metadata, is_owner = await run_db(db, get_file_for_user, current_user.id, file_id)
     
     if not file_metadata:
         raise HTTPException(
@@ -171,34 +875,20 @@ def delete_file(
         )
     
     # Check if file belongs to the user
-    association = get_user_file_association(db, current_user.id, file_id)
-    if not association:
+    if not is_owner:
         logger.warning(f"Unauthorized file deletion attempt: file_id={file_id} by user_id={current_user.id}")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to delete this file"
         )
     
-    # Delete file from disk
-    file_path = Path(file_metadata.filePath)
-    if file_path.exists():
-        try:
-            file_path.unlink()
-            logger.info(f"Deleted file from disk: {file_path}")
-        except Exception as e:
-            logger.error(f"Error deleting file from disk: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error deleting file from disk: {str(e)}"
-            )
-    
-    # Delete file metadata and association from database
-    success = delete_file_and_association(db, file_id)
+    # Tombstone the file; its content is reclaimed by the garbage collector
+    deleted = await run_db(db, tombstone_user_files, current_user.id, [file_id])
     
-    if not success:
+    if not deleted:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error deleting file from database"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
         )
     
     logger.info(f"File deleted: file_id={file_id} by user_id={current_user.id}")
@@ -0,0 +1,268 @@
+"""Resumable upload session API routes."""
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Path as PathParam
+from starlette.concurrency import run_in_threadpool
+
+from app.db.database import DbSession, get_db, release_db_connection, run_db
+from app.models import (
+    FileUploadResponse,
+    FileDeleteResponse,
+    UploadSessionCreate,
+    UploadSessionResponse,
+    ChunkUploadResponse
+)
+from app.services.file_service import save_file_record
+from app.services.upload_service import stream_to_disk, FileTooLargeError
+from app.services.blob_service import new_staging_path, place_blob, drop_blob_references
+from app.services.thumbnail_service import schedule_previews
+from app.services.upload_session_service import (
+    create_upload_session,
+    get_upload_session,
+    get_received_chunks,
+    get_total_chunks,
+    get_expected_chunk_size,
+    get_chunk_path,
+    claim_upload_session,
+    release_upload_session,
+    assemble_upload_session,
+    delete_upload_session,
+    discard_session_chunks
+)
+from app.services.usage_service import get_usage, QuotaExceededError
+from app.services.auth_service import get_current_user
+from app.db.tables import User, UploadSession
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/api/uploads", tags=["Upload Sessions"])
+
+
+def _session_response(upload_session: UploadSession) -> UploadSessionResponse:
+    """Build the session state response from the staged chunks on disk."""
+    total_chunks = get_total_chunks(upload_session)
+    received = get_received_chunks(upload_session)
+    received_set = set(received)
+    return UploadSessionResponse(
+        id=upload_session.id,
+        fileName=upload_session.fileName,
+        fileType=upload_session.fileType,
+        fileSize=upload_session.fileSize,
+        chunkSize=upload_session.chunkSize,
+        totalChunks=total_chunks,
+        receivedChunks=received,
+        receivedOffsets=[i * upload_session.chunkSize for i in received],
+        missingChunks=[i for i in range(total_chunks) if i not in received_set],
+        expiry=upload_session.expiry
+    )
+
+
+async def _get_owned_session(db: DbSession, session_id: str, user: User) -> UploadSession:
+    """Fetch an upload session owned by the user or raise 404."""
+    upload_session = await run_db(db, get_upload_session, session_id, user.id)
+    if not upload_session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found or expired"
+        )
+    return upload_session
+
+
+@router.post("/", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def start_upload_session(
+    data: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Start a resumable upload session."""
+    if data.fileSize > settings.UPLOAD_SESSION_MAX_FILE_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds maximum size of {settings.UPLOAD_SESSION_MAX_FILE_SIZE_MB} MB"
+        )
+    if data.chunkSize and data.chunkSize > settings.UPLOAD_SESSION_MAX_CHUNK_SIZE_MB * 1024 * 1024:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk size exceeds maximum of {settings.UPLOAD_SESSION_MAX_CHUNK_SIZE_MB} MB"
+        )
+    chunk_size = data.chunkSize or settings.UPLOAD_SESSION_CHUNK_SIZE_MB * 1024 * 1024
+    if -(-data.fileSize // chunk_size) > settings.UPLOAD_SESSION_MAX_CHUNKS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File would need more than {settings.UPLOAD_SESSION_MAX_CHUNKS} chunks; use a larger chunk size"
+        )
+    # Reject before any chunk is sent; the quota is enforced again at commit
+    usage = await run_db(db, get_usage, current_user.id)
+    if not usage.allows(data.fileSize, 1):
+        raise HTTPException(
+            status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+            detail="Storage quota exceeded"
+        )
+
+    upload_session = await run_db(db, create_upload_session, current_user.id, data)
+    return await run_in_threadpool(_session_response, upload_session)
+
+
+@router.get("/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session_status(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Get an upload session with the chunks received so far."""
+    upload_session = await _get_owned_session(db, session_id, current_user)
+    return await run_in_threadpool(_session_response, upload_session)
+
+
+@router.put("/{session_id}/chunks/{index}", response_model=ChunkUploadResponse)
+async def upload_chunk(
+    request: Request,
+    session_id: str,
+    index: int = PathParam(..., ge=0),
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Store one numbered chunk from the raw request body. Chunks may arrive in any order or in parallel."""
+    upload_session = await _get_owned_session(db, session_id, current_user)
+
+    if upload_session.status != "open":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload session is already being committed"
+        )
+    if index >= get_total_chunks(upload_session):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk index out of range (0-{get_total_chunks(upload_session) - 1})"
+        )
+
+    expected_size = get_expected_chunk_size(upload_session, index)
+    offset = index * upload_session.chunkSize
+    # Don't hold a pooled connection while a (possibly slow) client sends the chunk
+    await release_db_connection(db)
+    try:
+        stored = await stream_to_disk(
+            request.stream(),
+            get_chunk_path(session_id, index),
+            max_bytes=expected_size
+        )
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk {index} must be exactly {expected_size} bytes"
+        )
+    except FileNotFoundError:
+        # The session was aborted and its chunk directory removed mid-upload
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found or expired"
+        )
+
+    if stored.size != expected_size:
+        await run_in_threadpool(stored.path.unlink, True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk {index} must be exactly {expected_size} bytes"
+        )
+
+    # An abort (or the reaper) may have discarded the session while the chunk
+    # streamed in; its chunk directory is already gone, so clean up after it
+    if not await run_db(db, get_upload_session, session_id, current_user.id):
+        await run_in_threadpool(discard_session_chunks, session_id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found or expired"
+        )
+
+    logger.debug(f"Stored chunk {index} for upload session {session_id}")
+
+    return ChunkUploadResponse(
+        index=index,
+        offset=offset,
+        size=stored.size
+    )
+
+
+@router.post("/{session_id}/commit", response_model=FileUploadResponse, status_code=status.HTTP_201_CREATED)
+async def commit_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Assemble all chunks into the final file and record its metadata."""
+    upload_session = await _get_owned_session(db, session_id, current_user)
+
+    if not await run_db(db, claim_upload_session, upload_session):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload session is already being committed"
+        )
+
+    missing = (await run_in_threadpool(_session_response, upload_session)).missingChunks
+    if missing:
+        await run_db(db, release_upload_session, upload_session)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload session is missing {len(missing)} chunks (first missing: {missing[0]})"
+        )
+
+    try:
+        stored = await run_in_threadpool(assemble_upload_session, upload_session, new_staging_path())
+        placed = await place_blob(db, stored.path, stored.sha256)
+        try:
+            db_file = await save_file_record(
+                db,
+                current_user.id,
+                fileName=upload_session.fileName,
+                fileType=upload_session.fileType,
+                fileSize=stored.size,
+                filePath=placed.locator,
+                blobHash=stored.sha256,
+                contentEncoding=placed.encoding,
+                storedSize=placed.stored_size
+            )
+        except BaseException:
+            await drop_blob_references(db, [stored.sha256])
+            raise
+    except QuotaExceededError:
+        # Keep the chunks so the commit can be retried once space is freed
+        await run_db(db, release_upload_session, upload_session)
+        raise HTTPException(
+            status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+            detail="Storage quota exceeded"
+        )
+    except Exception as e:
+        await run_db(db, release_upload_session, upload_session)
+        logger.error(f"Error committing upload session {session_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error committing upload session: {str(e)}"
+        )
+
+    await run_db(db, delete_upload_session, upload_session)
+    await run_in_threadpool(discard_session_chunks, session_id)
+
+    schedule_previews(db_file)
+    logger.info(f"File uploaded via session {session_id}: {db_file.fileName} by user_id={current_user.id}")
+
+    return FileUploadResponse(
+        id=db_file.id,
+        fileName=db_file.fileName,
+        fileType=db_file.fileType,
+        fileSize=db_file.fileSize,
+        filePath=db_file.filePath,
+        message="File uploaded successfully"
+    )
+
+
+@router.delete("/{session_id}", response_model=FileDeleteResponse)
+async def abort_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: DbSession = Depends(get_db)
+):
+    """Abort an upload session and discard its chunks."""
+    upload_session = await _get_owned_session(db, session_id, current_user)
+    await run_db(db, delete_upload_session, upload_session)
+    await run_in_threadpool(discard_session_chunks, session_id)
+    return FileDeleteResponse(message="Upload session aborted")
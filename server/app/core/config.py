@@ -1,7 +1,9 @@
 """Application configuration using Pydantic BaseSettings."""
+import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
 from functools import lru_cache
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -18,12 +20,136 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     
+    # Refresh-token sessions (hashed at rest, hot tokens cached per process)
+    SESSION_CACHE_MAX_ENTRIES: int = 10000
+    SESSION_CACHE_TTL_SECONDS: int = 3600
+    SESSION_REAP_INTERVAL_SECONDS: int = 3600
+    SESSION_REAP_BATCH_SIZE: int = 1000
+    
+    # Password hashing (bcrypt runs on a dedicated pool so auth bursts can't starve file I/O)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = one per CPU core
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    
+    # Authenticated principal cache (per process)
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    
     # Database
     DATABASE_URL: str = "sqlite:///./dropbox.db"
+    DATABASE_ASYNC: bool = False
+    DATABASE_POOL_SIZE: int = 20
+    DATABASE_MAX_OVERFLOW: int = 20
+    
+    # SQLite tuning ("performance" applies the pragmas below on every connection)
+    SQLITE_PROFILE: Literal["default", "performance"] = "performance"
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_MB: int = 64
+    SQLITE_MMAP_SIZE_MB: int = 256
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_SINGLE_WRITER: bool = True
+    
+    # Group commit: batch metadata writes from concurrent uploads into one transaction
+    GROUP_COMMIT_ENABLED: bool = False
+    GROUP_COMMIT_WINDOW_MS: int = 5
+    GROUP_COMMIT_MAX_BATCH: int = 64
     
     # File Storage
     UPLOADS_DIR: str = "./uploads"
     MAX_FILE_SIZE_MB: int = 100
+    UPLOAD_CHUNK_SIZE_KB: int = 1024
+    BATCH_MAX_FILES: int = 100
+    
+    # Blob storage backend ("local" under UPLOADS_DIR/blobs, or any S3-compatible store)
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    STORAGE_FANOUT_LEVELS: int = 2
+    LOCAL_STORAGE_MAX_CONCURRENCY: int = 64
+    S3_BUCKET: str = "dropbox-blobs"
+    S3_PREFIX: str = "blobs/"
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PART_SIZE_MB: int = 16
+    S3_MAX_CONCURRENCY: int = 32
+    
+    # Deleted-file garbage collection and storage reconciliation
+    GC_INTERVAL_SECONDS: int = 30
+    GC_BATCH_SIZE: int = 500
+    GC_UNLINKS_PER_SECOND: int = 200
+    STORAGE_RECONCILE_INTERVAL_SECONDS: int = 86400
+    STORAGE_RECONCILE_GRACE_SECONDS: int = 3600
+    BLOB_DELETE_WAIT_SECONDS: int = 60  # how long an upload waits for identical content to finish being deleted
+    BLOB_DELETE_STALE_SECONDS: int = 300  # a deletion marked this long ago was interrupted; the collector completes it
+    
+    # Compression at rest for compressible content ("zstd" needs the zstandard package)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_CODEC: Literal["gzip", "zstd"] = "gzip"
+    COMPRESSION_LEVEL: int = 6
+    COMPRESSION_MIN_SIZE_BYTES: int = 1024
+    COMPRESSION_MAX_SIZE_MB: int = 256  # larger files stay uncompressed so ranged reads can seek (0 = no limit)
+    COMPRESSION_MAX_RATIO: float = 0.9  # store compressed only if it saves at least 10%
+    
+    # Thumbnails / previews (images and first PDF page; needs the "previews" extra)
+    THUMBNAIL_SIZES: list[int] = [64, 256, 1024]
+    THUMBNAIL_DEFAULT_SIZE: int = 256
+    THUMBNAIL_QUALITY: int = 80
+    THUMBNAIL_WORKERS: int = 2
+    THUMBNAIL_MAX_SOURCE_MB: int = 50
+    
+    # ZIP archive downloads
+    ARCHIVE_READ_AHEAD_CHUNKS: int = 8
+    ARCHIVE_COMPRESS_LEVEL: int = 6
+    ARCHIVE_WORKERS: int = 8  # archives being written at once; more wait for a free writer
+    
+    # Delta sync (rsync-style block signatures); block size doubles until a signature fits DELTA_MAX_BLOCKS
+    DELTA_BLOCK_SIZE_KB: int = 64
+    DELTA_MAX_BLOCKS: int = 65536
+    DELTA_MAX_BLOCK_SIZE_KB: int = 1024  # a signature buffers one block, so this bounds its memory
+    DELTA_SIGNATURE_CACHE_ENTRIES: int = 16
+    DELTA_SIGNATURE_CACHE_TTL_SECONDS: int = 600
+    DELTA_MAX_FILE_SIZE_MB: int = 10240
+    
+    # Per-user quotas (0 = unlimited); usage counters are reconciled periodically
+    USER_QUOTA_MB: int = 0
+    USER_QUOTA_FILES: int = 0
+    USAGE_RECONCILE_INTERVAL_SECONDS: int = 3600
+    
+    # Change feed (sync cursor) and long-polling
+    CHANGE_FEED_PAGE_SIZE: int = 500
+    CHANGE_FEED_MAX_WAIT_SECONDS: int = 60
+    CHANGE_FEED_RETENTION_DAYS: int = 30
+    CHANGE_FEED_PRUNE_INTERVAL_SECONDS: int = 3600
+    
+    # Real-time notifications (Server-Sent Events)
+    EVENTS_QUEUE_SIZE: int = 64  # per connection; slower consumers are dropped
+    EVENTS_HEARTBEAT_SECONDS: int = 25
+    EVENTS_MAX_STREAM_SECONDS: int = 1800  # clients reconnect (re-authenticating) after this
+    EVENTS_MAX_CONNECTIONS_PER_USER: int = 10
+    EVENTS_RETRY_MS: int = 3000
+    
+    # Upload admission control (0 = unlimited); excess uploads wait in a bounded queue
+    UPLOAD_MAX_CONCURRENT: int = 64
+    UPLOAD_MAX_CONCURRENT_PER_USER: int = 4
+    UPLOAD_MAX_QUEUED: int = 256
+    UPLOAD_MAX_QUEUED_PER_USER: int = 16
+    UPLOAD_QUEUE_TIMEOUT_SECONDS: int = 30
+    UPLOAD_RETRY_AFTER_SECONDS: int = 5
+    UPLOAD_USER_BANDWIDTH_KB_PER_SECOND: int = 0  # shared by all of a user's uploads
+    UPLOAD_BANDWIDTH_BURST_SECONDS: float = 1.0
+    
+    # Resumable Upload Sessions
+    UPLOAD_SESSION_CHUNK_SIZE_MB: int = 8
+    UPLOAD_SESSION_MAX_CHUNK_SIZE_MB: int = 64
+    UPLOAD_SESSION_MAX_FILE_SIZE_MB: int = 10240
+    UPLOAD_SESSION_MAX_CHUNKS: int = 10000  # bounds per-session bookkeeping; small chunks need a small file
+    UPLOAD_SESSION_EXPIRE_HOURS: int = 24
+    UPLOAD_SESSION_REAP_INTERVAL_SECONDS: int = 600
+    
+    # Metrics (Prometheus text format at /metrics)
+    METRICS_ENABLED: bool = True
     
     # Server
     HOST: str = "localhost"
@@ -35,15 +161,72 @@ class Settings(BaseSettings):
         case_sensitive=True
     )
     
+    @property
+    def password_hash_workers(self) -> int:
+        """Get the number of password hashing workers."""
+        return self.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+    
+    @property
+    def user_quota_bytes(self) -> int:
+        """Get the per-user storage quota in bytes (0 = unlimited)."""
+        return self.USER_QUOTA_MB * 1024 * 1024
+    
+    @property
+    def upload_bandwidth_bytes_per_second(self) -> int:
+        """Get the per-user upload bandwidth limit in bytes per second (0 = unlimited)."""
+        return self.UPLOAD_USER_BANDWIDTH_KB_PER_SECOND * 1024
+    
     @property
     def uploads_path(self) -> Path:
         """Get uploads directory as Path object."""
         return Path(self.UPLOADS_DIR)
     
+    @property
+    def async_database_url(self) -> str:
+        """Get DATABASE_URL with the aiosqlite driver for the asyncio engine."""
+        if self.DATABASE_URL.startswith("sqlite:"):
+            return self.DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1)
+        return self.DATABASE_URL
+    
     @property
     def max_file_size_bytes(self) -> int:
         """Get max file size in bytes."""
         return self.MAX_FILE_SIZE_MB * 1024 * 1024
+    
+    @property
+    def delta_max_block_size_bytes(self) -> int:
+        """Get the largest delta signature block size in bytes."""
+        return self.DELTA_MAX_BLOCK_SIZE_KB * 1024
+    
+    @property
+    def delta_max_file_size_bytes(self) -> int:
+        """Get the largest file version a delta may reconstruct, in bytes."""
+        return self.DELTA_MAX_FILE_SIZE_MB * 1024 * 1024
+    
+    @property
+    def blobs_path(self) -> Path:
+        """Get root directory of the content-addressed blob store."""
+        return self.uploads_path / "blobs"
+    
+    @property
+    def blob_staging_path(self) -> Path:
+        """Get directory where uploads are staged before being moved into the blob store."""
+        return self.blobs_path / ".staging"
+    
+    @property
+    def thumbnails_path(self) -> Path:
+        """Get directory where generated previews are cached."""
+        return self.uploads_path / "thumbnails"
+    
+    @property
+    def upload_sessions_path(self) -> Path:
+        """Get staging directory for resumable upload session chunks."""
+        return self.uploads_path / ".sessions"
+    
+    @property
+    def upload_chunk_size_bytes(self) -> int:
+        """Get upload streaming chunk size in bytes."""
+        return self.UPLOAD_CHUNK_SIZE_KB * 1024
 
 
 @lru_cache()
@@ -0,0 +1,311 @@
+"""In-process metrics (counters, gauges, histograms) with a Prometheus text exposition."""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from fast cache hits to slow uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Route label for requests that matched no route, so unknown paths can't grow the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class MetricsRegistry:
+    """The set of metrics rendered at /metrics."""
+
+    def __init__(self):
+        self._metrics: List["Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> None:
+        """Add a metric; names must be unique."""
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class Metric:
+    """
+    Base for labelled metrics.
+
+    Values are kept per tuple of label values and updated under a lock, as
+    they are observed from the event loop and from worker threads. A metric
+    built with a callback instead reads its values when rendered, which suits
+    counters and gauges that some other component already maintains.
+    """
+
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _samples(self) -> Dict[LabelValues, float]:
+        if self.callback is not None:
+            return self.callback()
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self._samples().items()
+        ]
+
+
+class Counter(Metric):
+    """A monotonically increasing total."""
+
+    type = "counter"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        """Add amount to the counter for the given label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down."""
+
+    type = "gauge"
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        """Set the gauge for the given label values."""
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        """Raise the gauge for the given label values."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        """Lower the gauge for the given label values."""
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [per-bucket counts (the last is +Inf)..., sum]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        """Record one observation for the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        bucket_names = self.labelnames + ("le",)
+        lines = []
+        for labels, series in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_names, labels + (_format_value(bound),))} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class RequestStats:
+    """
+    Work attributed to the request being served (see current_request).
+
+    Updated from the event loop and from worker threads (including the
+    database writer), so updates and reads are made under a lock.
+    """
+
+    __slots__ = ("db_queries", "db_seconds", "_lock")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_query(self, seconds: float) -> None:
+        """Count one database statement that took seconds."""
+        with self._lock:
+            self.db_queries += 1
+            self.db_seconds += seconds
+
+    def snapshot(self) -> Tuple[int, float]:
+        """Get the (query count, query seconds) recorded so far."""
+        with self._lock:
+            return self.db_queries, self.db_seconds
+
+
+# The request a unit of work belongs to; threadpool calls inherit it with the context
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests completed.",
+    ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the response body is fully sent.",
+    ("method", "route")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served (by method; the route is only known once dispatched).",
+    ("method",)
+)
+http_request_bytes = Counter(
+    "http_request_body_bytes_total",
+    "Request body bytes received (uploaded).",
+    ("method", "route")
+)
+http_response_bytes = Counter(
+    "http_response_body_bytes_total",
+    "Response body bytes sent (downloaded).",
+    ("method", "route")
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries",
+    "Database queries issued per HTTP request.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+http_request_db_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing database queries per HTTP request.",
+    ("method", "route")
+)
+
+
+def _route_template(scope: Scope) -> str:
+    """Get the path template of the route a dispatched request was served by."""
+    return getattr(scope.get("route"), "path_format", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests, body bytes and database work.
+
+    Requests are labelled by route template ("/api/files/{file_id}/download"),
+    never by raw path, so label cardinality stays bounded. The template is read
+    from the scope once the router has dispatched the request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        received = 0
+        sent = 0
+
+        async def receive_counted() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message: Message) -> None:
+            nonlocal status_code, sent
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_requests_in_flight.inc((method,))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec((method,))
+            current_request.reset(token)
+            labels = (method, _route_template(scope))
+            http_request_duration.observe(elapsed, labels)
+            http_requests.inc(labels + (str(status_code),))
+            if received:
+                http_request_bytes.inc(labels, received)
+            if sent:
+                http_response_bytes.inc(labels, sent)
+            db_queries, db_seconds = stats.snapshot()
+            http_request_db_queries.observe(db_queries, labels)
+            http_request_db_duration.observe(db_seconds, labels)
@@ -0,0 +1,37 @@
+"""Periodic background task helpers."""
+import asyncio
+from typing import Callable, List
+from starlette.concurrency import run_in_threadpool
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Tasks started by start_periodic_task, cancelled on shutdown
+_background_tasks: List[asyncio.Task] = []
+
+
+async def _run_periodically(name: str, interval_seconds: float, func: Callable[[], object]) -> None:
+    """Call a blocking function in the threadpool every interval_seconds."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(func)
+        except Exception as e:
+            logger.error(f"Background task {name} failed: {e}")
+
+
+def start_periodic_task(name: str, interval_seconds: float, func: Callable[[], object]) -> asyncio.Task:
+    """Schedule a blocking function to run periodically on the running event loop."""
+    task = asyncio.create_task(_run_periodically(name, interval_seconds, func), name=name)
+    _background_tasks.append(task)
+    logger.info(f"Started background task: {name} (every {interval_seconds}s)")
+    return task
+
+
+async def stop_background_tasks() -> None:
+    """Cancel all periodic tasks and wait for them to finish."""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
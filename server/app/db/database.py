@@ -1,37 +1,216 @@
 """Database configuration and session management."""
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar, Union
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.metrics import Counter, Histogram, current_request
 
 logger = get_logger(__name__)
 
+IS_SQLITE = settings.DATABASE_URL.startswith("sqlite")
+
 # Create SQLAlchemy engine
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},  # Needed for SQLite
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW
 )
 
+
+def _sqlite_pragmas() -> dict:
+    """Get the PRAGMA statements for the configured SQLite profile."""
+    if settings.SQLITE_PROFILE != "performance":
+        return {}
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_MB * 1024,  # negative = KiB
+        "mmap_size": settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Apply the SQLite performance profile to every new DBAPI connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+db_queries = Counter("db_queries_total", "Database statements executed.")
+db_query_duration = Histogram("db_query_duration_seconds", "Database statement execution time.")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Note when a statement starts (a stack, as statements on one connection can nest)."""
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """Record a statement's duration, and attribute it to the request being served, if any."""
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.record_query(elapsed)
+
+
+def _instrument(sync_engine) -> None:
+    """Time every statement an engine executes."""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+if settings.METRICS_ENABLED:
+    _instrument(engine)
+
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Optional asyncio engine (aiosqlite) used for request sessions when DATABASE_ASYNC is set.
+# The sync engine above is still used for schema setup and background jobs.
+async_engine = create_async_engine(
+    settings.async_database_url,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW
+) if settings.DATABASE_ASYNC else None
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None else None
+)
+if async_engine is not None and IS_SQLITE:
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+if async_engine is not None and settings.METRICS_ENABLED:
+    _instrument(async_engine.sync_engine)
+
+# SQLite allows one writer at a time. Funnelling writes through a single thread (sync
+# sessions) or a single lock (async sessions) avoids "database is locked" retries while
+# reads keep fanning out across the pool.
+_writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_async_write_lock: Optional[asyncio.Lock] = None
+
+# Session type handed to request handlers by get_db
+DbSession = Union[Session, AsyncSession]
+
+T = TypeVar("T")
 
 # Create Base class for declarative models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency function to get database session."""
+async def get_db():
+    """Dependency function to get database session (async when DATABASE_ASYNC is set)."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+
+async def release_db_connection(db: DbSession) -> None:
+    """Return a request session's pooled connection while the request idles; the session stays usable."""
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+
+def begin_write(db: Session) -> None:
+    """
+    Start a session's transaction holding SQLite's write lock (BEGIN IMMEDIATE).
+
+    Other writers, in this process or another, wait until the transaction ends,
+    so nothing it reads can change before it writes. Must be the first
+    statement of the transaction.
+    """
+    db.execute(text("BEGIN IMMEDIATE"))
+
+
+def db_write(fn: Callable[..., T]) -> Callable[..., T]:
+    """Mark a service function as writing to the database so run_db serializes it."""
+    fn._db_write = True
+    return fn
+
+
+def _get_async_write_lock() -> asyncio.Lock:
+    """Get the process-wide async write lock, creating it on first use."""
+    global _async_write_lock
+    if _async_write_lock is None:
+        _async_write_lock = asyncio.Lock()
+    return _async_write_lock
+
+
+async def run_db(db: DbSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a sync service function against a request session without blocking the event loop.
+
+    Async sessions run it via run_sync (non-blocking aiosqlite I/O); sync sessions run it
+    in the threadpool. Service functions therefore stay plain `fn(db, ...)` callables.
+    Functions marked with @db_write are serialized through the single writer.
+    """
+    serialize = settings.SQLITE_SINGLE_WRITER and getattr(fn, "_db_write", False)
+    if isinstance(db, AsyncSession):
+        if serialize:
+            async with _get_async_write_lock():
+                return await db.run_sync(fn, *args, **kwargs)
+        return await db.run_sync(fn, *args, **kwargs)
+    if serialize:
+        loop = asyncio.get_running_loop()
+        # Carry the request's context over to the writer thread (as run_in_threadpool does)
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_writer_executor, functools.partial(context.run, fn, db, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
 
 
 def init_db():
     """Initialize database by creating all tables."""
-    from app.db.tables import User, File, UserToFileAssociation, Session
+    from app.db.tables import User, File, UserToFileAssociation, Session, UploadSession, Blob, BlobDeletion, FileChange, UserUsage
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    add_missing_indexes()
     logger.info("Database tables created successfully")
 
+
+def add_missing_columns():
+    """Add nullable columns introduced after a table was first created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+
+def add_missing_indexes():
+    """Create indexes introduced after a table was first created."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,100 @@
+"""Group commit: batch small writes from concurrent requests into shared transactions."""
+import asyncio
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+from app.db.database import SessionLocal, _writer_executor, _get_async_write_lock
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# (fn, args, kwargs, future) for one submitted unit of work
+PendingWrite = Tuple[Callable[..., Any], tuple, dict, asyncio.Future]
+
+
+class GroupCommitter:
+    """
+    Collect write units submitted within a short window and commit them together.
+
+    Each unit is a sync `fn(db, ...)` that stages rows without committing. A batch
+    is flushed after window_ms or once max_batch units are pending, and runs on the
+    single database writer with one commit. If the batch fails it is rolled back and
+    every unit is retried in its own transaction, so one bad unit only fails itself.
+    """
+
+    def __init__(self, name: str, window_ms: int, max_batch: int):
+        self.name = name
+        self.window_seconds = window_ms / 1000
+        self.max_batch = max(max_batch, 1)
+        self._pending: List[PendingWrite] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Queue a write unit and wait for the batch containing it to commit."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((fn, args, kwargs, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Hand the pending units to the writer as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[PendingWrite]) -> None:
+        """Commit a batch on the writer thread and resolve each unit's future."""
+        loop = asyncio.get_running_loop()
+        units = [(fn, args, kwargs) for fn, args, kwargs, _ in batch]
+        try:
+            if settings.DATABASE_ASYNC and settings.SQLITE_SINGLE_WRITER:
+                async with _get_async_write_lock():
+                    outcomes = await loop.run_in_executor(_writer_executor, self._commit_batch, units)
+            else:
+                outcomes = await loop.run_in_executor(_writer_executor, self._commit_batch, units)
+        except Exception as e:
+            outcomes = [(None, e)] * len(batch)
+
+        for (_, _, _, future), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _commit_batch(self, units: List[Tuple[Callable[..., Any], tuple, dict]]) -> List[Tuple[Any, Optional[Exception]]]:
+        """Run all units in one transaction, falling back to one transaction per unit on failure."""
+        db = SessionLocal()
+        try:
+            try:
+                results = [fn(db, *args, **kwargs) for fn, args, kwargs in units]
+                db.commit()
+                logger.debug(f"Group commit {self.name}: {len(units)} writes in one transaction")
+                return [(result, None) for result in results]
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Group commit {self.name} failed for batch of {len(units)}, retrying individually: {str(e)}")
+
+            outcomes = []
+            for fn, args, kwargs in units:
+                try:
+                    result = fn(db, *args, **kwargs)
+                    db.commit()
+                    outcomes.append((result, None))
+                except Exception as e:
+                    db.rollback()
+                    outcomes.append((None, e))
+            return outcomes
+        finally:
+            db.close()
@@ -1,5 +1,5 @@
 """SQLAlchemy database table definitions."""
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -31,11 +31,71 @@ class File(Base):
     fileType = Column(String, nullable=False)
     fileSize = Column(Integer, nullable=False)
     filePath = Column(String, nullable=False)
+    blobHash = Column(String, ForeignKey("blobs.sha256"), nullable=True, index=True)
+    contentEncoding = Column(String, nullable=True)  # codec of the stored bytes (copied from the blob)
+    storedSize = Column(Integer, nullable=True)  # size of the stored bytes when encoded
     created = Column(DateTime, default=datetime.utcnow, nullable=False)
     modified = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    deletedAt = Column(DateTime, nullable=True, index=True)  # tombstone awaiting garbage collection
     
     # Relationships
     file_associations = relationship("UserToFileAssociation", back_populates="file", cascade="all, delete-orphan")
+    
+    # Keyset pagination indexes: (sort column, id) for each supported sort
+    __table_args__ = (
+        Index("ix_files_created_id", "created", "id"),
+        Index("ix_files_fileName_id", "fileName", "id"),
+        Index("ix_files_fileSize_id", "fileSize", "id"),
+        # MIME-prefix filters in search are range scans on this index
+        Index("ix_files_fileType_id", "fileType", "id"),
+    )
+
+
+class Blob(Base):
+    """Content-addressed blob shared by every File with identical content."""
+    __tablename__ = "blobs"
+    
+    sha256 = Column(String, primary_key=True)
+    size = Column(Integer, nullable=False)
+    refCount = Column(Integer, default=0, nullable=False)
+    encoding = Column(String, nullable=True)  # "gzip"/"zstd" if stored compressed
+    storedSize = Column(Integer, nullable=True)
+    created = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BlobDeletion(Base):
+    """A blob whose content is being removed from storage; no reference can be taken on it meanwhile."""
+    __tablename__ = "blob_deletions"
+    
+    sha256 = Column(String, primary_key=True)
+    created = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UserUsage(Base):
+    """Materialized per-user storage usage, kept in step with file writes (see usage_service)."""
+    __tablename__ = "user_usage"
+    
+    userId = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    bytesUsed = Column(Integer, default=0, nullable=False)
+    fileCount = Column(Integer, default=0, nullable=False)
+    modified = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class FileChange(Base):
+    """Per-user journal of file changes; ids are the sync cursor, increasing with every write."""
+    __tablename__ = "file_changes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    userId = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    fileId = Column(Integer, nullable=False)  # not a foreign key: entries outlive purged files
+    action = Column(String, nullable=False)  # "created", "updated" or "deleted"
+    created = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    # AUTOINCREMENT so ids are never reused after pruning and cursors only move forward
+    __table_args__ = (
+        Index("ix_file_changes_userId_id", "userId", "id"),
+        {"sqlite_autoincrement": True},
+    )
 
 
 class UserToFileAssociation(Base):
@@ -55,15 +115,30 @@ class UserToFileAssociation(Base):
 
 
 class Session(Base):
-    """Session table for storing refresh tokens."""
+    """Session table for storing refresh tokens (as SHA-256 hashes)."""
     __tablename__ = "sessions"
     
     id = Column(Integer, primary_key=True, index=True)
     token = Column(String, unique=True, index=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    expiry = Column(DateTime, nullable=False)
+    expiry = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="sessions")
 
+
+
+class UploadSession(Base):
+    """Resumable upload session staging numbered chunks before commit."""
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    fileName = Column(String, nullable=False)
+    fileType = Column(String, nullable=False)
+    fileSize = Column(Integer, nullable=False)
+    chunkSize = Column(Integer, nullable=False)
+    status = Column(String, default="open", nullable=False)
+    expiry = Column(DateTime, nullable=False, index=True)
+    created = Column(DateTime, default=datetime.utcnow, nullable=False)
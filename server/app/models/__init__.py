@@ -5,7 +5,24 @@ from app.models.file import (
     FileInfo,
     FileListResponse,
     FileUploadResponse,
-    FileDeleteResponse
+    FileDeleteResponse,
+    BlobCheckResponse,
+    FileFromHashRequest,
+    BatchFileError,
+    BatchUploadResponse,
+    BatchFileIdsRequest,
+    BatchDeleteResponse,
+    BatchMetadataResponse,
+    FileSignatureResponse,
+    FileChangeInfo,
+    FileChangesResponse,
+    UsageResponse,
+    FileSearchResponse
+)
+from app.models.upload_session import (
+    UploadSessionCreate,
+    UploadSessionResponse,
+    ChunkUploadResponse
 )
 
 __all__ = [
@@ -18,5 +35,20 @@ __all__ = [
     "FileListResponse",
     "FileUploadResponse",
     "FileDeleteResponse",
+    "BlobCheckResponse",
+    "FileFromHashRequest",
+    "BatchFileError",
+    "BatchUploadResponse",
+    "BatchFileIdsRequest",
+    "BatchDeleteResponse",
+    "BatchMetadataResponse",
+    "FileSignatureResponse",
+    "FileChangeInfo",
+    "FileChangesResponse",
+    "UsageResponse",
+    "FileSearchResponse",
+    "UploadSessionCreate",
+    "UploadSessionResponse",
+    "ChunkUploadResponse",
 ]
 
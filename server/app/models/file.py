@@ -1,6 +1,7 @@
 """Pydantic models for file-related data."""
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Optional
 
 
 class FileInfo(BaseModel):
@@ -21,6 +22,7 @@ class FileListResponse(BaseModel):
     total: int = Field(..., description="Total number of files")
     page: int = Field(..., ge=1, description="Current page number")
     page_size: int = Field(..., ge=1, le=100, description="Number of files per page")
+    next_cursor: Optional[str] = Field(default=None, description="Opaque cursor for the next page, if any")
 
 
 class FileUploadResponse(BaseModel):
@@ -37,3 +39,87 @@ class FileDeleteResponse(BaseModel):
     """Schema for file delete response."""
     message: str
 
+
+
+class BlobCheckResponse(BaseModel):
+    """Schema for a content-hash existence check."""
+    sha256: str
+    exists: bool
+
+
+class FileFromHashRequest(BaseModel):
+    """Schema for creating a file from content one of the user's files already has."""
+    fileName: str = Field(..., min_length=1, max_length=255, description="Original file name")
+    fileType: str = Field(default="application/octet-stream", description="MIME type of the file")
+    fileSize: int = Field(..., ge=0, description="File size in bytes")
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$", description="Lowercase hex SHA-256 of the content")
+
+
+class BatchFileError(BaseModel):
+    """Schema for one file that failed within a batch upload."""
+    fileName: str
+    detail: str
+
+
+class BatchUploadResponse(BaseModel):
+    """Schema for a multi-file upload response."""
+    files: list[FileUploadResponse]
+    errors: list[BatchFileError] = Field(default_factory=list, description="Files that could not be stored")
+
+
+class BatchFileIdsRequest(BaseModel):
+    """Schema for a batch operation on many file IDs."""
+    ids: list[int] = Field(..., min_length=1, max_length=1000, description="File IDs")
+
+
+class BatchDeleteResponse(BaseModel):
+    """Schema for a bulk delete response."""
+    deleted: list[int]
+    not_found: list[int] = Field(default_factory=list, description="IDs that don't exist or aren't owned by the user")
+    message: str
+
+
+class BatchMetadataResponse(BaseModel):
+    """Schema for a bulk metadata fetch response."""
+    files: list[FileInfo]
+    not_found: list[int] = Field(default_factory=list, description="IDs that don't exist or aren't owned by the user")
+
+
+class FileSignatureResponse(BaseModel):
+    """Schema for the block signatures of a file's current content, for delta sync."""
+    fileId: int
+    etag: str = Field(..., description="ETag of the signed version; send it as If-Match with the delta")
+    fileSize: int
+    blockSize: int = Field(..., description="Block size in bytes; the last block may be shorter")
+    weakHash: str = Field(..., description="Rolling checksum algorithm")
+    strongHash: str = Field(..., description="Strong hash algorithm")
+    blocks: list[tuple[int, str]] = Field(default_factory=list, description="[weak, strong] checksums per block")
+
+
+class FileChangeInfo(BaseModel):
+    """Schema for the latest change to one file in the change feed."""
+    fileId: int
+    action: str = Field(..., description='"created", "updated" or "deleted"')
+    file: Optional[FileInfo] = Field(default=None, description="Current metadata, unless deleted")
+
+
+class FileChangesResponse(BaseModel):
+    """Schema for a page of the change feed."""
+    changes: list[FileChangeInfo]
+    cursor: int = Field(..., description="Cursor to pass to the next request")
+    has_more: bool = Field(..., description="Whether more changes are available right away")
+
+
+class UsageResponse(BaseModel):
+    """Schema for a user's storage usage and quota."""
+    bytesUsed: int
+    fileCount: int
+    quotaBytes: Optional[int] = Field(default=None, description="Storage quota in bytes, if limited")
+    quotaFiles: Optional[int] = Field(default=None, description="File count quota, if limited")
+    bytesRemaining: Optional[int] = Field(default=None, description="Bytes left before the quota, if limited")
+
+
+class FileSearchResponse(BaseModel):
+    """Schema for a page of file search results."""
+    files: list[FileInfo]
+    next_cursor: Optional[str] = Field(default=None, description="Opaque cursor for the next page, if any")
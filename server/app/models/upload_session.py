@@ -0,0 +1,33 @@
+"""Pydantic models for resumable upload sessions."""
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+
+class UploadSessionCreate(BaseModel):
+    """Schema for starting a resumable upload session."""
+    fileName: str = Field(..., min_length=1, max_length=255, description="Original file name")
+    fileType: str = Field(default="application/octet-stream", description="MIME type of the file")
+    fileSize: int = Field(..., ge=0, description="Total file size in bytes")
+    chunkSize: Optional[int] = Field(default=None, ge=1, description="Chunk size in bytes (server default if omitted)")
+
+
+class UploadSessionResponse(BaseModel):
+    """Schema for upload session state."""
+    id: str
+    fileName: str
+    fileType: str
+    fileSize: int
+    chunkSize: int
+    totalChunks: int
+    receivedChunks: list[int] = Field(default_factory=list, description="Indexes of chunks already stored")
+    receivedOffsets: list[int] = Field(default_factory=list, description="Byte offsets of chunks already stored")
+    missingChunks: list[int] = Field(default_factory=list, description="Indexes of chunks still expected")
+    expiry: datetime
+
+
+class ChunkUploadResponse(BaseModel):
+    """Schema for a stored chunk."""
+    index: int
+    offset: int
+    size: int
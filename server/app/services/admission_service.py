@@ -0,0 +1,280 @@
+"""Upload admission control: concurrency limits, a bounded wait queue and per-user bandwidth shaping."""
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import Counter, Gauge
+from app.services.auth_service import get_token_user_id
+
+logger = get_logger(__name__)
+
+# Requests that stream file content into the server
+UPLOAD_ROUTES = (
+    ("POST", re.compile(r"^/api/files/upload/?$")),
+    ("POST", re.compile(r"^/api/files/batch/upload/?$")),
+    ("POST", re.compile(r"^/api/files/\d+/delta/?$")),
+    ("PUT", re.compile(r"^/api/uploads/[^/]+/chunks/\d+/?$")),
+)
+
+# Unauthenticated uploads (rejected by the route, but only after their body is read) share one user's limits
+ANONYMOUS = None
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when an upload can't be admitted; status_code is 429 (the user's limit) or 503 (server busy)."""
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate bytes per second, holding at most capacity.
+
+    A consumer larger than the balance drives it negative and sleeps off the
+    debt, so chunks of any size are shaped and consumers sharing a bucket split
+    its rate between them.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    async def consume(self, n: int) -> None:
+        """Take n tokens, sleeping until the bucket has paid them back."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= n
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+class UploadAdmission:
+    """
+    Admits uploads under a global and a per-user concurrency limit (0 = unlimited).
+
+    Uploads over a limit wait in one FIFO queue. A freed slot goes to the oldest
+    waiter that can use it, so a user at their own limit never holds up others
+    and new arrivals can't overtake eligible waiters. The queue is bounded
+    (globally and per user) and so is each wait, which keeps queueing delay
+    predictable; an upload that can't be queued or waits too long is rejected.
+    Used only from the event loop, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        max_active: int,
+        max_active_per_user: int,
+        max_queued: int,
+        max_queued_per_user: int,
+        queue_timeout: float
+    ):
+        self.max_active = max_active
+        self.max_active_per_user = max_active_per_user
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._active_by_user: Dict[Optional[int], int] = {}
+        self._waiters: Deque[Tuple[Optional[int], asyncio.Future]] = deque()
+        self._queued_by_user: Dict[Optional[int], int] = {}
+        self._buckets: Dict[Optional[int], TokenBucket] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _user_full(self, user_id: Optional[int]) -> bool:
+        return bool(self.max_active_per_user) and self._active_by_user.get(user_id, 0) >= self.max_active_per_user
+
+    def _global_full(self) -> bool:
+        return bool(self.max_active) and self._active >= self.max_active
+
+    def _start(self, user_id: Optional[int]) -> None:
+        self._active += 1
+        self._active_by_user[user_id] = self._active_by_user.get(user_id, 0) + 1
+        self.admitted += 1
+
+    def _reject(self, user_id: Optional[int], detail: str) -> AdmissionRejectedError:
+        self.rejected += 1
+        status_code = 429 if self._user_full(user_id) else 503
+        return AdmissionRejectedError(status_code, detail)
+
+    def _dequeue(self, user_id: Optional[int], future: asyncio.Future) -> None:
+        try:
+            self._waiters.remove((user_id, future))
+        except ValueError:
+            return
+        self._queued_by_user[user_id] -= 1
+        if not self._queued_by_user[user_id]:
+            del self._queued_by_user[user_id]
+
+    async def acquire(self, user_id: Optional[int]) -> None:
+        """Wait for an upload slot, raising AdmissionRejectedError if the queue is full or the wait times out."""
+        # Eligible waiters are always granted eagerly, so none can be ahead of an eligible arrival
+        if not self._global_full() and not self._user_full(user_id):
+            self._start(user_id)
+            return
+
+        if self.max_queued and len(self._waiters) >= self.max_queued:
+            raise self._reject(user_id, "Upload queue is full, please retry")
+        if self.max_queued_per_user and self._queued_by_user.get(user_id, 0) >= self.max_queued_per_user:
+            self.rejected += 1
+            raise AdmissionRejectedError(429, "Too many concurrent uploads, please retry")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((user_id, future))
+        self._queued_by_user[user_id] = self._queued_by_user.get(user_id, 0) + 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            self._dequeue(user_id, future)
+            if future.done():
+                return
+            self.timed_out += 1
+            raise self._reject(user_id, "Timed out waiting for an upload slot, please retry")
+        except asyncio.CancelledError:
+            self._dequeue(user_id, future)
+            if future.done():
+                self.release(user_id)
+            raise
+
+    def release(self, user_id: Optional[int]) -> None:
+        """Free an upload slot and hand it to the oldest waiter that can use it."""
+        self._active -= 1
+        self._active_by_user[user_id] -= 1
+        if not self._active_by_user[user_id]:
+            del self._active_by_user[user_id]
+            self._buckets.pop(user_id, None)
+
+        for waiter in list(self._waiters):
+            if self._global_full():
+                break
+            waiting_user, future = waiter
+            if self._user_full(waiting_user):
+                continue
+            self._dequeue(waiting_user, future)
+            self._start(waiting_user)
+            future.set_result(None)
+
+    def get_bucket(self, user_id: Optional[int]) -> Optional[TokenBucket]:
+        """Get the bandwidth bucket shared by a user's active uploads, or None if bandwidth is unlimited."""
+        rate = settings.upload_bandwidth_bytes_per_second
+        if not rate:
+            return None
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(rate, rate * settings.UPLOAD_BANDWIDTH_BURST_SECONDS)
+            self._buckets[user_id] = bucket
+        return bucket
+
+    def stats(self) -> Dict[str, int]:
+        """Get current load and admission counters."""
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+upload_admission = UploadAdmission(
+    settings.UPLOAD_MAX_CONCURRENT,
+    settings.UPLOAD_MAX_CONCURRENT_PER_USER,
+    settings.UPLOAD_MAX_QUEUED,
+    settings.UPLOAD_MAX_QUEUED_PER_USER,
+    settings.UPLOAD_QUEUE_TIMEOUT_SECONDS
+)
+
+Gauge(
+    "upload_admission_active",
+    "Uploads currently admitted.",
+    callback=lambda: {(): upload_admission.stats()["active"]}
+)
+Gauge(
+    "upload_admission_queued",
+    "Uploads waiting for a slot.",
+    callback=lambda: {(): upload_admission.stats()["queued"]}
+)
+Counter(
+    "upload_admission_rejected_total",
+    "Uploads rejected because the queue was full or the wait timed out.",
+    callback=lambda: {(): upload_admission.stats()["rejected"]}
+)
+
+
+def _is_upload(scope: Scope) -> bool:
+    """Check whether a request is one of the upload routes."""
+    method = scope["method"]
+    path = scope["path"]
+    return any(method == route_method and pattern.match(path) for route_method, pattern in UPLOAD_ROUTES)
+
+
+def _get_user_id(scope: Scope) -> Optional[int]:
+    """Identify the uploading user from the request's bearer token."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return get_token_user_id(token.strip())
+            break
+    return ANONYMOUS
+
+
+class UploadAdmissionMiddleware:
+    """
+    ASGI middleware applying upload admission before any of the body is read.
+
+    Runs ahead of routing because FastAPI reads and spools multipart bodies
+    before a route's dependencies run. The request body is metered through the
+    user's token bucket as it is received, which paces every write path
+    (multipart spooling, chunk and delta streaming) at the configured bandwidth.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _is_upload(scope):
+            await self.app(scope, receive, send)
+            return
+
+        user_id = _get_user_id(scope)
+        try:
+            await upload_admission.acquire(user_id)
+        except AdmissionRejectedError as e:
+            logger.warning(f"Rejected upload for user_id={user_id}: {e.detail}")
+            response = JSONResponse(
+                {"detail": e.detail},
+                status_code=e.status_code,
+                headers={"Retry-After": str(settings.UPLOAD_RETRY_AFTER_SECONDS)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            bucket = upload_admission.get_bucket(user_id)
+            if bucket is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def receive_shaped() -> Message:
+                message = await receive()
+                if message["type"] == "http.request" and message.get("body"):
+                    await bucket.consume(len(message["body"]))
+                return message
+
+            await self.app(scope, receive_shaped, send)
+        finally:
+            upload_admission.release(user_id)
@@ -0,0 +1,233 @@
+"""Archive service for streaming ZIP downloads of many files."""
+import asyncio
+import concurrent.futures
+import io
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import PurePosixPath
+from typing import AsyncIterator, List, Optional
+
+from app.db.tables import File
+from app.services.blob_service import content_exists, iter_content
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Content that is already compressed is stored as-is; deflating it again only burns CPU
+PRECOMPRESSED_TYPE_PREFIXES = ("image/", "video/", "audio/")
+PRECOMPRESSED_TYPES = {
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/vnd.rar",
+    "application/zstd",
+    "application/pdf",
+    "application/epub+zip",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+# Uncompressed formats that happen to share a compressed-media prefix
+COMPRESSIBLE_MEDIA_TYPES = {"image/bmp", "image/svg+xml", "image/tiff", "audio/wav", "audio/x-wav"}
+
+# Earliest timestamp a ZIP entry can carry
+ZIP_EPOCH = datetime(1980, 1, 1)
+
+# Archives are written by a bounded set of threads created on first use
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    """Get the archive writer pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.ARCHIVE_WORKERS, thread_name_prefix="archive-writer")
+    return _pool
+
+
+def shutdown_archive_pool() -> None:
+    """Stop the archive writer threads, dropping archives still waiting for one."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class ArchiveCancelledError(Exception):
+    """Raised in the archive writer thread once the client has gone away."""
+
+
+@dataclass
+class ArchiveEntry:
+    """One file to add to an archive."""
+    name: str
+    file: File
+    size: int
+    modified: datetime
+    compress: bool
+
+
+def is_precompressed(file_type: str) -> bool:
+    """Check whether a MIME type is already compressed."""
+    file_type = file_type.split(";")[0].strip().lower()
+    if file_type in COMPRESSIBLE_MEDIA_TYPES:
+        return False
+    return file_type in PRECOMPRESSED_TYPES or file_type.startswith(PRECOMPRESSED_TYPE_PREFIXES)
+
+
+def build_archive_entries(files: List[File]) -> List[ArchiveEntry]:
+    """Map files to archive entries, giving duplicate names a " (n)" suffix."""
+    entries = []
+    used = set()
+    for file in files:
+        # Keep only the final path component so entries can't escape the extraction dir
+        name = PurePosixPath(file.fileName.replace("\\", "/")).name or f"file-{file.id}"
+        stem, dot, suffix = name.rpartition(".")
+        if not stem:
+            stem, dot, suffix = name, "", ""
+        candidate, n = name, 1
+        while candidate.lower() in used:
+            candidate = f"{stem} ({n}){dot}{suffix}"
+            n += 1
+        used.add(candidate.lower())
+        entries.append(ArchiveEntry(
+            name=candidate,
+            file=file,
+            size=file.fileSize,
+            modified=max(file.modified, ZIP_EPOCH),
+            compress=not is_precompressed(file.fileType)
+        ))
+    return entries
+
+
+class _QueueWriter(io.RawIOBase):
+    """
+    Unseekable file object that hands written bytes to an asyncio queue.
+
+    Writes are coalesced into chunks of chunk_size and each put blocks while the
+    queue is full, which bounds read-ahead to the queue's maxsize chunks.
+    """
+
+    def __init__(
+        self,
+        queue: asyncio.Queue,
+        loop: asyncio.AbstractEventLoop,
+        cancelled: threading.Event,
+        chunk_size: int
+    ):
+        super().__init__()
+        self._queue = queue
+        self._loop = loop
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_size:
+            self._emit()
+        return len(data)
+
+    def flush(self) -> None:
+        if self._buffer and not self.closed:
+            self._emit()
+
+    def _emit(self) -> None:
+        """Queue the buffered bytes, waiting for room unless the download was cancelled."""
+        chunk, self._buffer = bytes(self._buffer), bytearray()
+        self.put(chunk)
+
+    def put(self, item: object) -> None:
+        """Put an item on the queue from the writer thread."""
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        while True:
+            if self._cancelled.is_set():
+                future.cancel()
+                raise ArchiveCancelledError()
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                continue
+
+
+# Marks the end of the archive stream on the queue
+_END = object()
+
+
+def _write_archive(entries: List[ArchiveEntry], writer: _QueueWriter) -> None:
+    """Write a ZIP of entries to writer; runs on the archive writer pool."""
+    try:
+        with zipfile.ZipFile(writer, "w", allowZip64=True, compresslevel=settings.ARCHIVE_COMPRESS_LEVEL) as zf:
+            for entry in entries:
+                if not content_exists(entry.file.blobHash, entry.file.filePath):
+                    logger.error(f"Skipping archive entry missing from storage: {entry.file.filePath}")
+                    continue
+                info = zipfile.ZipInfo(entry.name, date_time=entry.modified.timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED if entry.compress else zipfile.ZIP_STORED
+                # Declaring the size up front lets zipfile choose ZIP64 headers for large entries
+                info.file_size = entry.size
+                with zf.open(info, "w") as dst:
+                    for chunk in iter_content(entry.file, 0, entry.size):
+                        dst.write(chunk)
+        writer.flush()
+        writer.put(_END)
+    except ArchiveCancelledError:
+        logger.info("Archive download cancelled by client")
+    except Exception as e:
+        logger.error(f"Error writing archive: {str(e)}")
+        try:
+            writer.put(e)
+        except ArchiveCancelledError:
+            pass
+
+
+async def iter_zip_archive(entries: List[ArchiveEntry]) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive of entries as it is built, without staging a temp file.
+
+    Files are read and compressed on the archive writer pool, at most
+    ARCHIVE_READ_AHEAD_CHUNKS chunks ahead of the client, so memory use is constant
+    regardless of archive size. At most ARCHIVE_WORKERS archives are written at
+    once; further archives wait for a free writer before sending any bytes.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ARCHIVE_READ_AHEAD_CHUNKS)
+    cancelled = threading.Event()
+    writer = _QueueWriter(queue, loop, cancelled, settings.upload_chunk_size_bytes)
+    future = _get_pool().submit(_write_archive, entries, writer)
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        # Free the slot of an archive still waiting for a writer
+        future.cancel()
+        # Unblock a writer waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
+
+
+def archive_filename(files: List[File]) -> str:
+    """Get the download name for an archive of files."""
+    if len(files) == 1:
+        return f"{PurePosixPath(files[0].fileName).stem or 'file'}.zip"
+    return f"files-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"
+
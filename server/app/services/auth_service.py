@@ -1,73 +1,267 @@
 """Authentication service for login and token management."""
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import Depends, HTTPException, Security, status
+from typing import Optional, Dict, Any, Tuple
+from fastapi import Depends, HTTPException, Query, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from app.db.tables import User, Session as SessionModel
-from app.db.database import get_db
-from app.core.security import verify_password, verify_access_token
+from app.db.database import DbSession, SessionLocal, get_db, run_db, db_write
+from app.core.cache import TTLCache
+from app.core.metrics import Counter, Gauge
+from app.core.security import (
+    hash_password,
+    verify_password,
+    create_refresh_token,
+    password_needs_rehash,
+    run_password_job,
+    decode_access_token,
+    PasswordHasherBusyError
+)
 from app.core.config import settings
 from app.core.logging import get_logger
-from app.services.user_service import get_user_by_username
+from app.services.user_service import get_user_by_id, get_user_by_username, update_user_password
 
 logger = get_logger(__name__)
 
 # HTTP Bearer Security scheme
 security = HTTPBearer(auto_error=False)
 
+# Per-process principal caches: access token -> user_id (never outliving the token's exp)
+# and user_id -> User column snapshot (dropped whenever the user row changes)
+_token_cache: TTLCache[str, int] = TTLCache(
+    settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+_user_cache: TTLCache[int, Dict[str, Any]] = TTLCache(
+    settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
 
-def authenticate_user(username: str, password: str, db: Session) -> Optional[User]:
+# Columns copied into the user snapshot; the password hash is deliberately not cached
+_USER_SNAPSHOT_COLUMNS = ("id", "displayName", "userName", "created", "modified")
+
+
+def _snapshot_user(user: User) -> Dict[str, Any]:
+    """Copy the cacheable columns of a user row."""
+    return {column: getattr(user, column) for column in _USER_SNAPSHOT_COLUMNS}
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """Drop a user's cached snapshot so the next request reloads it."""
+    _user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_changed(mapper, connection, target: User) -> None:
+    """Invalidate the principal cache whenever a user row is modified or deleted."""
+    invalidate_cached_user(target.id)
+
+
+def get_principal_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Get hit/miss/eviction counters for the principal caches."""
+    return {
+        "tokens": _token_cache.stats(),
+        "users": _user_cache.stats(),
+        "refresh_tokens": refresh_tokens.stats(),
+    }
+
+
+def _principal_cache_samples(key: str):
+    """Build a metric callback reading one counter of every principal cache."""
+    return lambda: {(cache,): stats[key] for cache, stats in get_principal_cache_stats().items()}
+
+
+Counter("auth_cache_hits_total", "Principal cache hits.", ("cache",), callback=_principal_cache_samples("hits"))
+Counter("auth_cache_misses_total", "Principal cache misses.", ("cache",), callback=_principal_cache_samples("misses"))
+Gauge(
+    "auth_cache_hit_ratio",
+    "Principal cache hits per lookup since startup.",
+    ("cache",),
+    callback=_principal_cache_samples("hit_ratio")
+)
+
+
+async def authenticate_user(username: str, password: str, db: DbSession) -> Optional[User]:
     """Authenticate a user with username and password."""
-    user = get_user_by_username(db, username)
+    user = await run_db(db, get_user_by_username, username)
     if not user:
         logger.warning(f"Authentication failed: user not found - {username}")
         return None
-    if not verify_password(password, user.password):
+    if not await run_password_job(verify_password, password, user.password):
         logger.warning(f"Authentication failed: invalid password - {username}")
         return None
     logger.info(f"User authenticated successfully: {username}")
+    
+    # Upgrade hashes made with an old cost factor while we have the plaintext
+    if password_needs_rehash(user.password):
+        try:
+            new_hash = await run_password_job(hash_password, password)
+        except PasswordHasherBusyError:
+            logger.info(f"Skipping password rehash for {username}: hashing pool busy")
+        else:
+            await run_db(db, update_user_password, user.id, new_hash)
+            logger.info(f"Rehashed password for {username} at cost {settings.BCRYPT_ROUNDS}")
     return user
 
 
-def store_refresh_token(user_id: int, refresh_token: str, db: Session) -> None:
+class RefreshTokenStore:
+    """
+    Refresh-token sessions backed by the sessions table.
+
+    Only the SHA-256 of each token is stored, so a leaked table can't be replayed.
+    Recently issued tokens are kept in an in-process LRU (token hash -> user_id),
+    added only once their row is committed, so rotation skips the lookup query.
+    The table stays authoritative because rotation only succeeds if its DELETE
+    actually removed the row; another worker's revoke can't clear this cache.
+    Expired rows are removed in batches by reap_expired, not on the request path.
+    """
+
+    def __init__(self, cache_max_entries: int, cache_ttl_seconds: float):
+        self._cache: TTLCache[str, int] = TTLCache(cache_max_entries, cache_ttl_seconds)
+
+    @staticmethod
+    def hash_token(refresh_token: str) -> str:
+        """Get the stored form of a refresh token."""
+        return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+    def _add(self, db: Session, user_id: int, refresh_token: str) -> Tuple[str, datetime]:
+        """Stage a session row for a new token without committing. Returns its (token hash, expiry)."""
+        token_hash = self.hash_token(refresh_token)
+        expiry = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        db.add(SessionModel(token=token_hash, user_id=user_id, expiry=expiry))
+        return token_hash, expiry
+
+    def _remember(self, token_hash: str, user_id: int, expiry: datetime) -> None:
+        """Cache a committed session."""
+        self._cache.set(token_hash, user_id, ttl_seconds=(expiry - datetime.utcnow()).total_seconds())
+
+    def _lookup(self, db: Session, token_hash: str) -> Optional[int]:
+        """Get the user ID for an unexpired token hash, from the cache or the table."""
+        user_id = self._cache.get(token_hash)
+        if user_id is not None:
+            return user_id
+        row = db.query(SessionModel.user_id).filter(
+            SessionModel.token == token_hash,
+            SessionModel.expiry > datetime.utcnow()
+        ).first()
+        return row.user_id if row else None
+
+    @db_write
+    def store(self, db: Session, user_id: int, refresh_token: str) -> None:
+        """Insert a session for a newly issued refresh token."""
+        token_hash, expiry = self._add(db, user_id, refresh_token)
+        db.commit()
+        self._remember(token_hash, user_id, expiry)
+
+    @db_write
+    def rotate(self, db: Session, refresh_token: str) -> Optional[Tuple[int, str]]:
+        """
+        Swap a refresh token for a new one in a single transaction.
+
+        Returns (user_id, new_token), or None if the token is unknown, expired or
+        was already rotated.
+        """
+        token_hash = self.hash_token(refresh_token)
+        user_id = self._lookup(db, token_hash)
+        self._cache.pop(token_hash)
+        if user_id is None:
+            return None
+        try:
+            deleted = db.query(SessionModel).filter(
+                SessionModel.token == token_hash,
+                SessionModel.expiry > datetime.utcnow()
+            ).delete(synchronize_session=False)
+            if not deleted:
+                db.rollback()
+                return None
+            new_token = create_refresh_token(user_id)
+            new_hash, expiry = self._add(db, user_id, new_token)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        self._remember(new_hash, user_id, expiry)
+        return user_id, new_token
+
+    @db_write
+    def revoke(self, db: Session, refresh_token: str) -> None:
+        """Delete a refresh token's session if present."""
+        token_hash = self.hash_token(refresh_token)
+        self._cache.pop(token_hash)
+        db.query(SessionModel).filter(SessionModel.token == token_hash).delete(synchronize_session=False)
+        db.commit()
+
+    def reap_expired(self) -> int:
+        """Delete expired sessions in batches of SESSION_REAP_BATCH_SIZE. Returns the number reaped."""
+        reaped = 0
+        db = SessionLocal()
+        try:
+            while True:
+                expired = db.query(SessionModel.id).filter(
+                    SessionModel.expiry <= datetime.utcnow()
+                ).limit(settings.SESSION_REAP_BATCH_SIZE).all()
+                session_ids = [row.id for row in expired]
+                if not session_ids:
+                    break
+                db.query(SessionModel).filter(
+                    SessionModel.id.in_(session_ids)
+                ).delete(synchronize_session=False)
+                db.commit()
+                reaped += len(session_ids)
+                if len(session_ids) < settings.SESSION_REAP_BATCH_SIZE:
+                    break
+        finally:
+            db.close()
+
+        if reaped:
+            logger.info(f"Reaped {reaped} expired refresh-token sessions")
+        return reaped
+
+    def stats(self) -> Dict[str, float]:
+        """Get hit/miss counters for the hot-token cache."""
+        return self._cache.stats()
+
+
+refresh_tokens = RefreshTokenStore(
+    settings.SESSION_CACHE_MAX_ENTRIES,
+    settings.SESSION_CACHE_TTL_SECONDS
+)
+
+
+async def store_refresh_token(user_id: int, refresh_token: str, db: DbSession) -> None:
     """Store a refresh token in the database."""
-    expiry = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    
-    session = SessionModel(
-        token=refresh_token,
-        user_id=user_id,
-        expiry=expiry
-    )
-    
-    db.add(session)
-    db.commit()
+    await run_db(db, refresh_tokens.store, user_id, refresh_token)
     logger.info(f"Stored refresh token for user_id={user_id}")
 
 
-def verify_refresh_token(refresh_token: str, db: Session) -> Optional[int]:
-    """Verify a refresh token and return the user ID."""
-    db_session = db.query(SessionModel).filter(SessionModel.token == refresh_token).first()
-    
-    if not db_session:
-        logger.warning("Refresh token not found")
-        return None
-    
-    # Check if token has expired
-    if datetime.utcnow() > db_session.expiry:
-        logger.warning("Refresh token expired")
-        db.delete(db_session)
-        db.commit()
-        return None
-    
-    logger.info(f"Refresh token verified for user_id={db_session.user_id}")
-    return db_session.user_id
+async def rotate_refresh_token(refresh_token: str, db: DbSession) -> Optional[Tuple[int, str]]:
+    """Replace a valid refresh token with a new one. Returns (user_id, new_token) or None."""
+    rotated = await run_db(db, refresh_tokens.rotate, refresh_token)
+    if rotated is None:
+        logger.warning("Refresh token rotation failed: token not found or expired")
+    else:
+        logger.info(f"Rotated refresh token for user_id={rotated[0]}")
+    return rotated
+
+
+async def revoke_refresh_token(refresh_token: str, db: DbSession) -> None:
+    """Delete a refresh token so it can no longer be used."""
+    await run_db(db, refresh_tokens.revoke, refresh_token)
 
 
-def get_current_user(
+def reap_expired_refresh_tokens() -> int:
+    """Delete expired refresh-token sessions; run periodically in the background."""
+    return refresh_tokens.reap_expired()
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db)
 ) -> User:
     """FastAPI dependency to get the current authenticated user from JWT token."""
     if not credentials:
@@ -77,11 +271,42 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    token = credentials.credentials
-    
-    # Verify JWT token
-    user_id = verify_access_token(token)
+    return await authenticate_access_token(credentials.credentials, db)
+
+
+async def get_current_user_for_stream(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    access_token: Optional[str] = Query(None, description="JWT for clients that can't set headers (EventSource)"),
+    db: DbSession = Depends(get_db)
+) -> User:
+    """Like get_current_user, but also accepts the JWT as an access_token query parameter."""
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
+    return await authenticate_access_token(token, db)
+
+
+def get_token_user_id(token: str) -> Optional[int]:
+    """Get the user id an access token was issued to, or None if it is invalid (no database access)."""
+    # Skip the decode for recently verified tokens
+    user_id = _token_cache.get(token)
+    if user_id is None:
+        payload = decode_access_token(token)
+        if payload is None:
+            return None
+        user_id = int(payload["sub"])
+        _token_cache.set(token, user_id, ttl_seconds=payload["exp"] - time.time())
+    return user_id
+
+
+async def authenticate_access_token(token: str, db: DbSession) -> User:
+    """Resolve a JWT access token to its user, raising 401 if it is invalid."""
+    user_id = get_token_user_id(token)
     if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -89,15 +314,20 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    # Get user from cache, falling back to the database
+    snapshot = _user_cache.get(user_id)
+    if snapshot is not None:
+        return User(**snapshot)
+    
+    user = await run_db(db, get_user_by_id, user_id)
     
     if not user:
+        _token_cache.pop(token)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    _user_cache.set(user_id, _snapshot_user(user))
     return user
-
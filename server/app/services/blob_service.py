@@ -0,0 +1,384 @@
+"""Blob service for content-addressed, deduplicated file storage."""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from starlette.concurrency import run_in_threadpool
+
+from app.db.database import DbSession, SessionLocal, begin_write, db_write, run_db
+from app.db.tables import Blob, BlobDeletion, File, UserToFileAssociation
+from app.storage import get_storage, LocalStorageBackend
+from app.services.compression_service import choose_encoding, compress_file, decompress_range, decompress_ranges
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# How often an upload rechecks whether identical content has finished being deleted
+PENDING_DELETION_POLL_SECONDS = 0.05
+
+
+class BlobPendingDeletionError(Exception):
+    """Raised when content stays marked for deletion longer than BLOB_DELETE_WAIT_SECONDS."""
+
+
+@dataclass
+class PlacedBlob:
+    """Where a blob was stored and how its stored bytes are encoded."""
+    locator: str
+    encoding: Optional[str]
+    stored_size: int
+
+
+def get_blob_locator(sha256: str) -> str:
+    """Get where a blob lives in the configured storage backend (stored as File.filePath)."""
+    return get_storage().locator(sha256)
+
+
+def new_staging_path() -> Path:
+    """Get a unique staging path for an upload whose hash is not yet known."""
+    return settings.blob_staging_path / uuid.uuid4().hex
+
+
+def _owned_by(db: Session, user_id: int, sha256: str):
+    """Get an EXISTS condition for one of the user's live files having this content."""
+    return db.query(File.id).join(
+        UserToFileAssociation,
+        File.id == UserToFileAssociation.fileId
+    ).filter(
+        UserToFileAssociation.userId == user_id,
+        File.blobHash == sha256,
+        File.deletedAt.is_(None)
+    ).exists()
+
+
+def user_has_blob(db: Session, user_id: int, sha256: str) -> bool:
+    """
+    Check whether one of the user's files already has this content.
+
+    Only the caller's own content is reported: confirming that anyone stores a
+    hash would let users probe for (and, via from-hash, copy) others' files.
+    """
+    return db.query(_owned_by(db, user_id, sha256)).scalar()
+
+
+def acquire_blob(
+    db: Session,
+    sha256: str,
+    size: int,
+    encoding: Optional[str] = None,
+    stored_size: Optional[int] = None
+) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Take a reference on a blob. The caller commits.
+
+    The refcount increment is an upsert so concurrent uploads of identical
+    content never collide. Returns the blob's (encoding, stored size) as recorded
+    by whichever upload stored it first.
+    """
+    stmt = sqlite_insert(Blob).values(
+        sha256=sha256,
+        size=size,
+        refCount=1,
+        encoding=encoding,
+        storedSize=stored_size
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"refCount": Blob.refCount + 1}
+    ).returning(Blob.encoding, Blob.storedSize)
+    row = db.execute(stmt).one()
+    return row.encoding, row.storedSize
+
+
+def _encode_staged(staged_path: Path, sha256: str) -> Tuple[Path, int, Optional[str], int]:
+    """
+    Compress staged content if that saves enough space (blocking).
+
+    The choice depends only on the bytes, so identical uploads are always stored
+    alike. Returns the path to store, the content size, and the encoding and
+    size of what is stored.
+    """
+    size = staged_path.stat().st_size
+    encoding = choose_encoding(staged_path, size)
+    if encoding:
+        encoded_path = staged_path.with_name(f"{staged_path.name}.{encoding}")
+        try:
+            stored_size = compress_file(staged_path, encoded_path, encoding)
+        except BaseException:
+            encoded_path.unlink(missing_ok=True)
+            raise
+        if stored_size <= size * settings.COMPRESSION_MAX_RATIO:
+            staged_path.unlink(missing_ok=True)
+            logger.info(f"Compressed blob {sha256} with {encoding}: {size} -> {stored_size} bytes")
+            return encoded_path, size, encoding, stored_size
+        encoded_path.unlink(missing_ok=True)
+    return staged_path, size, None, size
+
+
+@db_write
+def reserve_blob(
+    db: Session,
+    sha256: str,
+    size: int,
+    encoding: Optional[str],
+    stored_size: int
+) -> Optional[Tuple[Optional[str], Optional[int]]]:
+    """
+    Take a reference on a blob (see acquire_blob) and commit it.
+
+    Returns None, taking no reference, while the blob's content is being
+    deleted (see discard_blob); the caller retries once the deletion is done.
+    """
+    try:
+        begin_write(db)
+        if db.query(BlobDeletion.sha256).filter(BlobDeletion.sha256 == sha256).first() is not None:
+            # Nothing was written; commit (unlike rollback) keeps the caller's loaded objects
+            db.commit()
+            return None
+        recorded = acquire_blob(db, sha256, size, encoding, stored_size)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return recorded
+
+
+@db_write
+def reserve_owned_blob(db: Session, user_id: int, sha256: str, size: int) -> Optional[Tuple[Optional[str], Optional[int]]]:
+    """
+    Take a reference on content one of the user's files already has, and commit it.
+
+    Returns the blob's (encoding, stored size), or None if the user has no such
+    content (including when it has just been deleted).
+    """
+    try:
+        row = db.execute(
+            update(Blob).where(
+                Blob.sha256 == sha256,
+                Blob.size == size,
+                _owned_by(db, user_id, sha256)
+            ).values(refCount=Blob.refCount + 1).returning(Blob.encoding, Blob.storedSize)
+        ).first()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return (row.encoding, row.storedSize) if row else None
+
+
+async def place_blob(db: DbSession, staged_path: Path, sha256: str) -> PlacedBlob:
+    """
+    Move staged content into blob storage (or discard it if already stored), holding a reference on it.
+
+    The reference is committed before storage is checked for an existing copy,
+    so discard_blob can't delete the copy this upload dedups against; if that
+    copy is being deleted already, the upload waits for the deletion to finish
+    and then stores its own. The caller hands the reference over to a file
+    record (add_file_record, replace_file_content) or gives it back with
+    drop_blob_references.
+    """
+    path, size, encoding, stored_size = await run_in_threadpool(_encode_staged, staged_path, sha256)
+    try:
+        deadline = time.monotonic() + settings.BLOB_DELETE_WAIT_SECONDS
+        while True:
+            recorded = await run_db(db, reserve_blob, sha256, size, encoding, stored_size)
+            if recorded is not None:
+                break
+            if time.monotonic() >= deadline:
+                raise BlobPendingDeletionError(f"Blob {sha256} is still being deleted")
+            await asyncio.sleep(PENDING_DELETION_POLL_SECONDS)
+        encoding, stored_size = recorded
+    except BaseException:
+        await run_in_threadpool(path.unlink, True)
+        raise
+    try:
+        locator = await run_in_threadpool(get_storage().put, sha256, path)
+    except BaseException:
+        await run_in_threadpool(path.unlink, True)
+        await drop_blob_references(db, [sha256])
+        raise
+    return PlacedBlob(locator, encoding, stored_size)
+
+
+async def drop_blob_references(db: DbSession, hashes: Iterable[str]) -> None:
+    """Give back references from place_blob or reserve_owned_blob that no file took over."""
+    for sha256 in hashes:
+        if await run_db(db, release_blob, sha256):
+            await run_in_threadpool(discard_blob, sha256)
+
+
+@db_write
+def release_blob(db: Session, sha256: str) -> bool:
+    """
+    Drop a reference on a blob, deleting its row once no File refers to it.
+
+    Commits the refcount change. Returns True if the blob is now unreferenced
+    and its content should be removed with discard_blob.
+    """
+    try:
+        db.query(Blob).filter(Blob.sha256 == sha256).update(
+            {Blob.refCount: Blob.refCount - 1},
+            synchronize_session=False
+        )
+        removed = db.query(Blob).filter(
+            Blob.sha256 == sha256,
+            Blob.refCount <= 0
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return bool(removed)
+
+
+def release_blobs(db: Session, ref_counts: Dict[str, int]) -> List[str]:
+    """
+    Drop several references on each blob without committing.
+
+    Returns the hashes whose blobs are now unreferenced; their content should be
+    removed with discard_blob once the caller has committed.
+    """
+    if not ref_counts:
+        return []
+    for sha256, count in ref_counts.items():
+        db.query(Blob).filter(Blob.sha256 == sha256).update(
+            {Blob.refCount: Blob.refCount - count},
+            synchronize_session=False
+        )
+    unreferenced = [
+        row.sha256 for row in db.query(Blob.sha256).filter(
+            Blob.sha256.in_(list(ref_counts)),
+            Blob.refCount <= 0
+        )
+    ]
+    if unreferenced:
+        db.query(Blob).filter(Blob.sha256.in_(unreferenced)).delete(synchronize_session=False)
+    return unreferenced
+
+
+def discard_blob(sha256: str) -> bool:
+    """
+    Remove a blob's content from storage if it is still unreferenced (blocking).
+
+    The Blob row is rechecked and the blob marked as being deleted under the
+    database write lock; the content is then deleted with the lock released,
+    so writers never wait on storage. While marked, reserve_blob takes no
+    reference on the blob. Returns whether this call removed the content.
+    """
+    db = SessionLocal()
+    try:
+        begin_write(db)
+        if db.query(Blob.sha256).filter(Blob.sha256 == sha256).first() is not None:
+            logger.info(f"Blob {sha256} was referenced again; keeping its content")
+            db.rollback()
+            return False
+        if db.query(BlobDeletion.sha256).filter(BlobDeletion.sha256 == sha256).first() is not None:
+            db.rollback()
+            return False
+        db.add(BlobDeletion(sha256=sha256))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    _finish_deletion(sha256)
+    return True
+
+
+def _finish_deletion(sha256: str) -> None:
+    """Delete a marked blob's content from storage, then clear the mark (blocking)."""
+    try:
+        get_storage().delete(sha256)
+    finally:
+        db = SessionLocal()
+        try:
+            db.query(BlobDeletion).filter(BlobDeletion.sha256 == sha256).delete(synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def finish_stale_deletions(marked_before: datetime) -> int:
+    """
+    Complete deletions marked before a cutoff, left behind by a crash (blocking).
+
+    Returns the number completed.
+    """
+    db = SessionLocal()
+    try:
+        stale = [
+            row.sha256 for row in db.query(BlobDeletion.sha256).filter(
+                BlobDeletion.created < marked_before
+            )
+        ]
+    finally:
+        db.close()
+    for sha256 in stale:
+        _finish_deletion(sha256)
+    return len(stale)
+
+
+def content_exists(blob_hash: Optional[str], file_path: str) -> bool:
+    """Check that a file's content is present, in blob storage or (for legacy files) on disk."""
+    if blob_hash:
+        return get_storage().exists(blob_hash)
+    return Path(file_path).exists()
+
+
+def get_local_content_path(file: File) -> Optional[Path]:
+    """Get a local path holding a file's raw content, or None if it is remote or stored compressed."""
+    if not file.blobHash:
+        return Path(file.filePath)
+    storage = get_storage()
+    if isinstance(storage, LocalStorageBackend) and not file.contentEncoding:
+        return storage.path_for(file.blobHash)
+    return None
+
+
+def iter_content(file: File, start: int, end: int, decode: bool = True) -> Iterator[bytes]:
+    """
+    Yield bytes [start, end) of a file's content in bounded chunks (blocking).
+
+    Content stored compressed is decompressed on the fly unless decode is False,
+    in which case start and end address the stored (encoded) bytes. Decoding
+    always starts from the beginning of the content, however late start is.
+    """
+    chunk_size = settings.upload_chunk_size_bytes
+    if file.blobHash:
+        storage = get_storage()
+        if file.contentEncoding and decode:
+            encoded = storage.read_range(file.blobHash, 0, file.storedSize, chunk_size)
+            yield from decompress_range(encoded, file.contentEncoding, start, end)
+        else:
+            yield from storage.read_range(file.blobHash, start, end, chunk_size)
+        return
+    with open(file.filePath, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_decoded_ranges(file: File, ranges: List[Tuple[int, int]]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (range index, bytes) of a compressed file's decoded content for sorted, non-overlapping ranges (blocking).
+
+    The content is read and decoded once for all the ranges, rather than once per range.
+    """
+    encoded = get_storage().read_range(file.blobHash, 0, file.storedSize, settings.upload_chunk_size_bytes)
+    yield from decompress_ranges(encoded, file.contentEncoding, ranges)
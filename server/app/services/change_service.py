@@ -0,0 +1,159 @@
+"""Change feed service: the per-user file change journal and long-poll notifier."""
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.db.tables import File, FileChange
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CHANGE_CREATED = "created"
+CHANGE_UPDATED = "updated"
+CHANGE_DELETED = "deleted"
+
+
+class ChangeNotifier:
+    """
+    Wakes long-polling requests when a user's journal grows.
+
+    Waiters are plain futures on the event loop, so a parked request costs one
+    future and no thread. notify() is safe to call from the database writer
+    thread; wake-ups are handed to the loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[int, Set[asyncio.Future]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> asyncio.Future:
+        """Register for the user's next change. Subscribe before reading the journal so none is missed."""
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.setdefault(user_id, set()).add(future)
+        return future
+
+    def unsubscribe(self, user_id: int, future: asyncio.Future) -> None:
+        """Drop a waiter that is no longer needed."""
+        with self._lock:
+            waiters = self._waiters.get(user_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._waiters[user_id]
+
+    def notify(self, user_ids: Iterable[int]) -> None:
+        """Wake every waiter of the given users (callable from any thread)."""
+        if self._loop is None:
+            return
+        with self._lock:
+            woken = [self._waiters.pop(user_id, ()) for user_id in set(user_ids)]
+        futures = [future for waiters in woken for future in waiters]
+        if futures:
+            self._loop.call_soon_threadsafe(self._wake, futures)
+
+    @staticmethod
+    def _wake(futures: List[asyncio.Future]) -> None:
+        for future in futures:
+            if not future.done():
+                future.set_result(None)
+
+    def waiter_count(self) -> int:
+        """Get the number of parked waiters."""
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
+
+
+change_notifier = ChangeNotifier()
+
+
+@dataclass
+class ChangeEntry:
+    """The latest change to one file within a page of the feed."""
+    fileId: int
+    action: str
+    file: Optional[File]
+
+
+def record_change(db: Session, user_id: int, file_id: int, action: str) -> None:
+    """Append a change to the user's journal without committing (part of the caller's transaction)."""
+    db.add(FileChange(userId=user_id, fileId=file_id, action=action))
+
+
+def record_changes(db: Session, user_id: int, file_ids: List[int], action: str) -> None:
+    """Append the same change for several files without committing."""
+    db.add_all([FileChange(userId=user_id, fileId=file_id, action=action) for file_id in file_ids])
+
+
+def get_change_cursor(db: Session, user_id: int) -> int:
+    """Get the user's current journal position (the cursor to resume from after a full listing)."""
+    return db.query(func.max(FileChange.id)).filter(FileChange.userId == user_id).scalar() or 0
+
+
+def is_cursor_expired(db: Session, cursor: int) -> bool:
+    """Check whether changes after cursor may already have been pruned from the journal."""
+    oldest = db.query(func.min(FileChange.id)).scalar()
+    return oldest is not None and cursor + 1 < oldest
+
+
+def get_changes(db: Session, user_id: int, cursor: int, limit: int) -> Tuple[List[ChangeEntry], int, bool]:
+    """
+    Get the user's file changes after cursor, one entry per file with its current metadata.
+
+    Reads up to limit journal rows with the (userId, id) index. Several changes
+    to one file collapse into the last; a file that no longer exists is reported
+    as deleted. Returns (entries, next cursor, whether more changes remain).
+    """
+    rows = db.query(FileChange.id, FileChange.fileId, FileChange.action, File).outerjoin(
+        File,
+        and_(File.id == FileChange.fileId, File.deletedAt.is_(None))
+    ).filter(
+        FileChange.userId == user_id,
+        FileChange.id > cursor
+    ).order_by(FileChange.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest: Dict[int, ChangeEntry] = {}
+    for row in rows:
+        action = row.action if row.File is not None else CHANGE_DELETED
+        latest.pop(row.fileId, None)
+        latest[row.fileId] = ChangeEntry(fileId=row.fileId, action=action, file=row.File)
+    next_cursor = rows[-1].id if rows else cursor
+    return list(latest.values()), next_cursor, has_more
+
+
+def prune_changes() -> int:
+    """
+    Delete journal entries older than CHANGE_FEED_RETENTION_DAYS. Returns the number removed.
+
+    The newest entry is always kept so is_cursor_expired can tell how far back the journal reaches.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+    db = SessionLocal()
+    try:
+        newest = db.query(func.max(FileChange.id)).scalar()
+        if newest is None:
+            return 0
+        removed = db.query(FileChange).filter(
+            FileChange.created < cutoff,
+            FileChange.id < newest
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if removed:
+        logger.info(f"Pruned {removed} file change entries")
+    return removed
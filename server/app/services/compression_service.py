@@ -0,0 +1,218 @@
+"""Compression service for storing compressible content encoded at rest."""
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Leading bytes of formats that are already compressed (the decision is made from
+# content alone so identical uploads always get the same stored encoding)
+COMPRESSED_SIGNATURES = (
+    b"\x1f\x8b",                 # gzip
+    b"\x28\xb5\x2f\xfd",         # zstd
+    b"BZh",                      # bzip2
+    b"\xfd7zXZ\x00",             # xz
+    b"7z\xbc\xaf\x27\x1c",       # 7-zip
+    b"Rar!",                     # rar
+    b"PK\x03\x04",               # zip, docx/xlsx/pptx, jar, epub
+    b"\x89PNG",                  # png
+    b"\xff\xd8\xff",             # jpeg
+    b"GIF8",                     # gif
+    b"OggS",                     # ogg
+    b"ID3",                      # mp3
+    b"fLaC",                     # flac
+    b"\x1a\x45\xdf\xa3",         # matroska / webm
+)
+# RIFF containers (webp, avi, wav) and ISO media (mp4, mov, heic) carry their type later
+RIFF_COMPRESSED_TYPES = (b"WEBP", b"AVI ")
+ISO_MEDIA_MARKER = b"ftyp"
+
+SAMPLE_SIZE = 64 * 1024
+
+
+class _ChunkReader:
+    """File-like view of an iterable of byte chunks, for decompressors that pull their input."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return b""
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class _Codec:
+    """Streaming compressor/decompressor factory for one Content-Encoding token."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def compressor(self):
+        if self.name == "zstd":
+            import zstandard
+            return zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL).compressobj()
+        return zlib.compressobj(settings.COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+
+    def decompressor(self):
+        if self.name == "zstd":
+            import zstandard
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(31)
+
+    def iter_decompressed(self, chunks: Iterable[bytes], max_length: int) -> Iterator[bytes]:
+        """
+        Decompress a stream of encoded chunks, yielding at most max_length decoded bytes at a time.
+
+        Output is drained in bounded pieces, so a small, highly compressible
+        chunk can't expand into one huge buffer.
+        """
+        if self.name == "zstd":
+            import zstandard
+            yield from zstandard.ZstdDecompressor().read_to_iter(
+                _ChunkReader(chunks),
+                read_size=max_length,
+                write_size=max_length
+            )
+            return
+        decompressor = self.decompressor()
+        for chunk in chunks:
+            while True:
+                data = decompressor.decompress(chunk, max_length)
+                if data:
+                    yield data
+                chunk = decompressor.unconsumed_tail
+                # A full piece may leave output pending even once the input is consumed
+                if not chunk and len(data) < max_length:
+                    break
+
+
+def get_codec(encoding: str) -> _Codec:
+    """Get the codec for a stored encoding."""
+    if encoding not in ("gzip", "zstd"):
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+    return _Codec(encoding)
+
+
+def _looks_compressed(sample: bytes) -> bool:
+    """Check a content sample for signatures of already-compressed formats."""
+    if sample.startswith(COMPRESSED_SIGNATURES):
+        return True
+    if sample.startswith(b"RIFF") and sample[8:12] in RIFF_COMPRESSED_TYPES:
+        return True
+    return sample[4:8] == ISO_MEDIA_MARKER
+
+
+def choose_encoding(path: Path, size: int) -> Optional[str]:
+    """
+    Decide whether content should be stored compressed, and with which codec.
+
+    Skips small files and known compressed formats, then estimates entropy by
+    compressing a sample at the fastest level. Files over COMPRESSION_MAX_SIZE_MB
+    are also skipped: a compressed stream can't be entered mid-way, so serving a
+    range of it decoded means decompressing everything before the range.
+    """
+    if not settings.COMPRESSION_ENABLED or size < settings.COMPRESSION_MIN_SIZE_BYTES:
+        return None
+    if settings.COMPRESSION_MAX_SIZE_MB and size > settings.COMPRESSION_MAX_SIZE_MB * 1024 * 1024:
+        return None
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_SIZE)
+    if _looks_compressed(sample):
+        return None
+    if len(zlib.compress(sample, 1)) > len(sample) * settings.COMPRESSION_MAX_RATIO:
+        return None
+    return settings.COMPRESSION_CODEC
+
+
+def compress_file(source: Path, destination: Path, encoding: str) -> int:
+    """Compress a file in bounded chunks. Returns the compressed size."""
+    compressor = get_codec(encoding).compressor()
+    chunk_size = settings.upload_chunk_size_bytes
+    written = 0
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            data = compressor.compress(chunk)
+            dst.write(data)
+            written += len(data)
+        data = compressor.flush()
+        dst.write(data)
+        written += len(data)
+    return written
+
+
+def decompress_ranges(
+    chunks: Iterable[bytes],
+    encoding: str,
+    ranges: List[Tuple[int, int]]
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    Decompress a stream of encoded chunks once, yielding (range index, decoded bytes) for each range.
+
+    ranges must be sorted and non-overlapping (start, end) pairs. Compressed
+    streams can't be entered mid-way, so everything up to the last range's end
+    is decoded and bytes outside the ranges are discarded: a range near the end
+    of a file costs as much as reading the whole file (see choose_encoding).
+    """
+    if not ranges:
+        return
+    index = 0
+    position = 0
+    for data in get_codec(encoding).iter_decompressed(chunks, settings.upload_chunk_size_bytes):
+        data_start = position
+        position += len(data)
+        while index < len(ranges):
+            start, end = ranges[index]
+            if position <= start:
+                break
+            piece = data[max(start - data_start, 0):end - data_start]
+            if piece:
+                yield index, piece
+            if position < end:
+                break
+            index += 1
+        if index == len(ranges):
+            return
+
+
+def decompress_range(chunks: Iterable[bytes], encoding: str, start: int, end: int) -> Iterator[bytes]:
+    """Decompress a stream of encoded chunks, yielding decoded bytes [start, end) (see decompress_ranges)."""
+    if end <= start:
+        return
+    for _, data in decompress_ranges(chunks, encoding, [(start, end)]):
+        yield data
+
+
+def accepts_encoding(accept_encoding: Optional[str], encoding: str) -> bool:
+    """Check whether an Accept-Encoding header allows an encoding (honouring q=0)."""
+    if not accept_encoding:
+        return False
+    wildcard = False
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token == encoding:
+            return q > 0
+        if token == "*":
+            wildcard = q > 0
+    return wildcard
@@ -0,0 +1,241 @@
+"""Delta sync service for updating stored files from rsync-style block deltas."""
+import hashlib
+import struct
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+
+from app.db.tables import File
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.blob_service import discard_blob, get_local_content_path, iter_content, new_staging_path
+from app.services.thumbnail_service import discard_thumbnails
+from app.services.upload_service import StoredUpload, stream_to_disk
+
+logger = get_logger(__name__)
+
+# Checksums advertised with each signature so clients know what to compute
+WEAK_HASH = "adler32"
+STRONG_HASH = "blake2b-128"
+
+# Delta ops, each a one-byte code followed by big-endian fields:
+#   END                                       -- required terminator
+#   COPY     <u32 first block> <u32 count>    -- copy whole base blocks
+#   LITERAL  <u32 length> <length bytes>      -- new data
+OP_END = 0x00
+OP_COPY = 0x01
+OP_LITERAL = 0x02
+
+_COPY_ARGS = struct.Struct(">II")
+_LITERAL_ARGS = struct.Struct(">I")
+
+# (blob hash, block size) -> block signatures; content-addressed, so never stale
+_signature_cache: TTLCache[Tuple[str, int], List[Tuple[int, str]]] = TTLCache(
+    settings.DELTA_SIGNATURE_CACHE_ENTRIES,
+    settings.DELTA_SIGNATURE_CACHE_TTL_SECONDS
+)
+
+
+class DeltaFormatError(Exception):
+    """Raised when a delta stream is malformed or references blocks outside the base."""
+
+
+def get_block_count(file_size: int, block_size: int) -> int:
+    """Get the number of blocks (the last one possibly short) a file splits into."""
+    return -(-file_size // block_size)
+
+
+def get_block_size(file_size: int, requested: Optional[int] = None) -> int:
+    """
+    Get the signature block size for a file, doubling it until the block count fits DELTA_MAX_BLOCKS.
+
+    Never exceeds DELTA_MAX_BLOCK_SIZE_KB, since signing buffers a whole block;
+    files too large to fit DELTA_MAX_BLOCKS at that size get more blocks instead.
+    """
+    max_block_size = settings.delta_max_block_size_bytes
+    block_size = min(requested or settings.DELTA_BLOCK_SIZE_KB * 1024, max_block_size)
+    while get_block_count(file_size, block_size) > settings.DELTA_MAX_BLOCKS and block_size < max_block_size:
+        block_size = min(block_size * 2, max_block_size)
+    return block_size
+
+
+def _block_signature(block: bytes) -> Tuple[int, str]:
+    """Compute the (weak, strong) checksum pair of one block."""
+    return zlib.adler32(block), hashlib.blake2b(block, digest_size=16).hexdigest()
+
+
+def compute_signature(file: File, block_size: int) -> List[Tuple[int, str]]:
+    """
+    Compute the block signatures of a file's content (blocking).
+
+    The weak checksum is Adler-32, which clients can roll byte by byte to find
+    matching blocks at any offset; the strong hash confirms a weak match.
+    """
+    cache_key = (file.blobHash, block_size) if file.blobHash else None
+    if cache_key is not None:
+        cached = _signature_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    blocks = []
+    buffer = bytearray()
+    for chunk in iter_content(file, 0, file.fileSize):
+        buffer += chunk
+        if len(buffer) < block_size:
+            continue
+        view = memoryview(buffer)
+        offset = 0
+        while len(buffer) - offset >= block_size:
+            blocks.append(_block_signature(view[offset:offset + block_size]))
+            offset += block_size
+        view.release()
+        del buffer[:offset]
+    if buffer:
+        blocks.append(_block_signature(bytes(buffer)))
+
+    if cache_key is not None:
+        _signature_cache.set(cache_key, blocks)
+    return blocks
+
+
+class _DeltaReader:
+    """Incremental reader over an async byte stream."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._buffer = bytearray()
+
+    async def _fill(self) -> bool:
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return False
+        self._buffer += chunk
+        return True
+
+    async def read_exact(self, n: int) -> bytes:
+        """Read exactly n bytes, which must be small enough to buffer."""
+        while len(self._buffer) < n:
+            if not await self._fill():
+                raise DeltaFormatError("Delta ended unexpectedly")
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    async def iter_exact(self, n: int) -> AsyncIterator[bytes]:
+        """Yield exactly n bytes as they arrive, without buffering them all."""
+        while n > 0:
+            if not self._buffer and not await self._fill():
+                raise DeltaFormatError("Delta ended unexpectedly")
+            data = bytes(self._buffer[:n])
+            del self._buffer[:n]
+            n -= len(data)
+            yield data
+
+    async def at_eof(self) -> bool:
+        """Check whether the stream has no more bytes."""
+        while not self._buffer:
+            if not await self._fill():
+                return True
+        return False
+
+
+async def _iter_base_range(base: BinaryIO, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes [start, end) of the base content in bounded chunks."""
+    chunk_size = settings.upload_chunk_size_bytes
+    await run_in_threadpool(base.seek, start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = await run_in_threadpool(base.read, min(chunk_size, remaining))
+        if not chunk:
+            raise IOError("Base content is shorter than its recorded size")
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def _iter_reconstructed(
+    reader: _DeltaReader,
+    base: BinaryIO,
+    base_size: int,
+    block_size: int
+) -> AsyncIterator[bytes]:
+    """Apply delta ops from reader against the base, yielding the new content."""
+    block_count = get_block_count(base_size, block_size)
+    while True:
+        op = (await reader.read_exact(1))[0]
+        if op == OP_END:
+            if not await reader.at_eof():
+                raise DeltaFormatError("Unexpected data after the end of the delta")
+            return
+        if op == OP_COPY:
+            first, count = _COPY_ARGS.unpack(await reader.read_exact(_COPY_ARGS.size))
+            if count == 0 or first + count > block_count:
+                raise DeltaFormatError(f"Block range {first}+{count} is outside the base ({block_count} blocks)")
+            start = first * block_size
+            end = min((first + count) * block_size, base_size)
+            async for chunk in _iter_base_range(base, start, end):
+                yield chunk
+        elif op == OP_LITERAL:
+            (length,) = _LITERAL_ARGS.unpack(await reader.read_exact(_LITERAL_ARGS.size))
+            async for chunk in reader.iter_exact(length):
+                yield chunk
+        else:
+            raise DeltaFormatError(f"Unknown delta op {op:#04x}")
+
+
+def _spool_content(file: File, destination: Path) -> None:
+    """Copy a file's decoded content from storage to a local path."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with open(destination, "wb") as f:
+        for chunk in iter_content(file, 0, file.fileSize):
+            f.write(chunk)
+
+
+async def apply_delta(
+    file: File,
+    chunks: AsyncIterator[bytes],
+    block_size: int,
+    destination: Path,
+    max_bytes: Optional[int] = None
+) -> StoredUpload:
+    """
+    Reconstruct a file's new version from a streamed delta into destination.
+
+    Literal data is written as it arrives and copied blocks are read from the
+    base, so memory use is bounded regardless of file size. Base content that
+    is remote or stored compressed is spooled to a local staging file first so
+    block copies can seek. The result is hashed for placing in the blob store.
+    """
+    base_path = get_local_content_path(file)
+    spooled = None
+    if base_path is None:
+        spooled = new_staging_path()
+        await run_in_threadpool(_spool_content, file, spooled)
+        base_path = spooled
+
+    try:
+        base = await run_in_threadpool(open, base_path, "rb")
+        try:
+            return await stream_to_disk(
+                _iter_reconstructed(_DeltaReader(chunks), base, file.fileSize, block_size),
+                destination,
+                max_bytes=max_bytes,
+                compute_hash=True
+            )
+        finally:
+            await run_in_threadpool(base.close)
+    finally:
+        if spooled is not None:
+            await run_in_threadpool(spooled.unlink, True)
+
+
+def discard_replaced_content(file_id: int, base_hash: Optional[str], base_path: str, unreferenced: List[str]) -> None:
+    """Remove a file's previous content once a delta update has committed (blocking)."""
+    for sha256 in unreferenced:
+        if discard_blob(sha256):
+            discard_thumbnails(sha256)
+    if not base_hash:
+        Path(base_path).unlink(missing_ok=True)
+        discard_thumbnails(f"file-{file_id}")
@@ -0,0 +1,270 @@
+"""Download service for conditional and ranged file responses."""
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import quote
+from fastapi import Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+
+from app.db.tables import File
+from app.services.blob_service import iter_content, iter_decoded_ranges
+from app.services.compression_service import accepts_encoding
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Upper bound on ranges honoured in one request, to bound multipart overhead
+MAX_RANGES = 100
+
+ByteRange = Tuple[int, int]  # (start, end) with end exclusive
+
+
+class RangeNotSatisfiableError(Exception):
+    """Raised when no requested range overlaps the file."""
+
+    def __init__(self, size: int):
+        self.size = size
+        super().__init__(f"Requested range not satisfiable for size {size}")
+
+
+def make_etag(file: File, encoding: Optional[str] = None) -> str:
+    """
+    Build a strong ETag from stored metadata (the content hash when available).
+
+    Each content encoding is a distinct representation, so it gets its own tag.
+    """
+    if file.blobHash:
+        tag = file.blobHash
+    else:
+        modified = int(file.modified.replace(tzinfo=timezone.utc).timestamp())
+        tag = f"{file.id}-{file.fileSize}-{modified}"
+    if encoding:
+        tag = f"{tag}-{encoding}"
+    return f'"{tag}"'
+
+
+def get_last_modified(file: File) -> datetime:
+    """Get the file's Last-Modified time as an aware UTC datetime truncated to seconds."""
+    return file.modified.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _parse_http_date(value: str) -> Optional[datetime]:
+    """Parse an HTTP date header, returning None if it is invalid."""
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _etag_list_matches(header: str, etag: str) -> bool:
+    """Weak comparison of an ETag against an If-None-Match list."""
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since. If-None-Match takes precedence."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_list_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and last_modified <= since
+    return False
+
+
+def if_range_matches(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-Range: ranges are only served if the validator still matches."""
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Strong comparison; weak validators never match If-Range
+        return if_range == etag
+    since = _parse_http_date(if_range)
+    return since is not None and since == last_modified
+
+
+def parse_range_header(header: str, size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a bytes Range header into sorted, merged (start, end) ranges.
+
+    Returns None if the header is malformed (the full file should be served) and
+    raises RangeNotSatisfiableError if no range overlaps the file.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or not spec:
+        return None
+    parts = spec.split(",")
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges: List[ByteRange] = []
+    for part in parts:
+        first, dash, last = part.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first == "":
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(size - length, 0), size))
+            else:
+                start = int(first)
+                end = int(last) + 1 if last else max(size, start + 1)
+                if start < 0 or end <= start:
+                    return None
+                if start < size:
+                    ranges.append((start, min(end, size)))
+        except ValueError:
+            return None
+
+    if not ranges:
+        raise RangeNotSatisfiableError(size)
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def iter_file_content(file: File, start: int, end: int, encoded: bool = False) -> AsyncIterator[bytes]:
+    """
+    Yield bytes [start, end) of a file from its storage backend, read off the event loop.
+
+    With encoded, the range addresses the stored compressed bytes, which are sent
+    as-is; otherwise compressed content is decompressed as it streams, from its
+    start whatever the range (see decompress_ranges).
+    """
+    return iterate_in_threadpool(iter_content(file, start, end, decode=not encoded))
+
+
+def content_disposition(filename: str) -> str:
+    """Build an attachment Content-Disposition header, RFC 5987-encoding non-ASCII names."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def build_file_response(request: Request, file: File) -> Response:
+    """
+    Build a download response honouring conditional and Range request headers.
+
+    Returns 304 when the client's validators match, 206 for satisfiable ranges
+    (multipart/byteranges for several), 416 for unsatisfiable ones and 200 otherwise.
+    Content stored compressed is sent as stored, with Content-Encoding, to clients
+    that accept its codec (ranges then address the encoded bytes); other clients
+    get it decompressed on the fly. A decoded range can't seek, so it costs a
+    decode of everything before it; the parts of a multi-range response share
+    one decode, and files over COMPRESSION_MAX_SIZE_MB are never stored compressed.
+    """
+    encoded = bool(file.contentEncoding) and accepts_encoding(
+        request.headers.get("accept-encoding"),
+        file.contentEncoding
+    )
+    size = file.storedSize if encoded else file.fileSize
+    etag = make_etag(file, file.contentEncoding if encoded else None)
+    last_modified = get_last_modified(file)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": content_disposition(file.fileName),
+    }
+    if file.contentEncoding:
+        headers["Vary"] = "Accept-Encoding"
+    if encoded:
+        headers["Content-Encoding"] = file.contentEncoding
+
+    if is_not_modified(request, etag, last_modified):
+        headers.pop("Content-Disposition")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    range_header = request.headers.get("range")
+    ranges = None
+    if range_header and if_range_matches(request, etag, last_modified):
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiableError:
+            return Response(
+                status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{size}", "ETag": etag}
+            )
+
+    if not ranges:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            iter_file_content(file, 0, size, encoded),
+            media_type=file.fileType,
+            headers=headers
+        )
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+        headers["Content-Length"] = str(end - start)
+        return StreamingResponse(
+            iter_file_content(file, start, end, encoded),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=file.fileType,
+            headers=headers
+        )
+
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (
+            f"--{boundary}\r\n"
+            f"Content-Type: {file.fileType}\r\n"
+            f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+        ).encode("latin-1")
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    content_length = (
+        sum(len(part) for part in part_headers)
+        + sum(end - start for start, end in ranges)
+        + 2 * (len(ranges) - 1)
+        + len(closing)
+    )
+
+    async def iter_parts() -> AsyncIterator[bytes]:
+        if file.contentEncoding and not encoded:
+            # Decode the content once for every part rather than once per part
+            current = None
+            async for i, chunk in iterate_in_threadpool(iter_decoded_ranges(file, ranges)):
+                if i != current:
+                    yield (b"\r\n" if i else b"") + part_headers[i]
+                    current = i
+                yield chunk
+        else:
+            for i, ((start, end), part_header) in enumerate(zip(ranges, part_headers)):
+                yield (b"\r\n" if i else b"") + part_header
+                async for chunk in iter_file_content(file, start, end, encoded):
+                    yield chunk
+        yield closing
+
+    headers["Content-Length"] = str(content_length)
+    return StreamingResponse(
+        iter_parts(),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers
+    )
@@ -0,0 +1,137 @@
+"""In-process pub/sub hub fanning file change events out to connected clients."""
+import asyncio
+import json
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Set
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Queued in place of pending events when a subscriber falls too far behind
+_OVERFLOW = object()
+
+
+class TooManySubscriptionsError(Exception):
+    """Raised when a user already has EVENTS_MAX_CONNECTIONS_PER_USER open streams."""
+
+
+class Subscription:
+    """One connected client's bounded event queue."""
+
+    def __init__(self, user_id: int, max_queued: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+
+
+class EventHub:
+    """
+    Per-user fan-out of events to subscriptions, each with a bounded queue.
+
+    publish() may be called from any thread (the database writer publishes after
+    each commit); delivery happens on the event loop. A subscriber whose queue
+    is full is dropped: its pending events are replaced by an overflow marker so
+    the client knows to resync, and publishers are never slowed down by it.
+    """
+
+    def __init__(self, max_queued: int, max_per_user: int):
+        self.max_queued = max_queued
+        self.max_per_user = max_per_user
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Open a subscription to a user's events."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, self.max_queued)
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(user_id, set())
+            if len(subscriptions) >= self.max_per_user:
+                raise TooManySubscriptionsError()
+            subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Close a subscription."""
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, event: str, data: dict) -> None:
+        """Send an event to every subscription of a user (callable from any thread)."""
+        if self._loop is None:
+            return
+        with self._lock:
+            if user_id not in self._subscriptions:
+                return
+        self._loop.call_soon_threadsafe(self._deliver, user_id, (event, json.dumps(data, default=str)))
+
+    def _deliver(self, user_id: int, message: tuple) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(message)
+                self.published += 1
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        """Disconnect a slow consumer, leaving only the overflow marker in its queue."""
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(_OVERFLOW)
+        self.dropped += 1
+        logger.warning(f"Dropped slow event subscriber for user_id={subscription.user_id}")
+
+    def stats(self) -> Dict[str, int]:
+        """Get connection and delivery counters."""
+        with self._lock:
+            connections = sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+        return {"connections": connections, "published": self.published, "dropped": self.dropped}
+
+
+event_hub = EventHub(settings.EVENTS_QUEUE_SIZE, settings.EVENTS_MAX_CONNECTIONS_PER_USER)
+
+
+def _format_event(event: str, data: str) -> str:
+    """Frame one Server-Sent Event."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def iter_event_stream(subscription: Subscription) -> AsyncIterator[str]:
+    """
+    Yield a subscription's events as a Server-Sent Events stream.
+
+    Sends a comment every EVENTS_HEARTBEAT_SECONDS so proxies keep idle streams
+    open, and ends after EVENTS_MAX_STREAM_SECONDS so clients reconnect (and
+    re-authenticate) with a fresh token. Ends with an "overflow" event if the
+    client fell behind; it should then catch up from the change feed.
+    """
+    deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        while True:
+            timeout = min(settings.EVENTS_HEARTBEAT_SECONDS, deadline - time.monotonic())
+            if timeout <= 0:
+                return
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if message is _OVERFLOW:
+                yield _format_event("overflow", "{}")
+                return
+            yield _format_event(*message)
+    finally:
+        event_hub.unsubscribe(subscription)
@@ -1,102 +1,391 @@
 """File service for file-related operations."""
-from sqlalchemy.orm import Session
-from typing import Optional, List
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query, Session
+from typing import Optional, List, Tuple, Dict
 
+from app.db.database import DbSession, db_write, run_db
+from app.db.group_commit import GroupCommitter
 from app.db.tables import File, UserToFileAssociation
+from app.services.blob_service import release_blobs
+from app.services.change_service import (
+    record_change,
+    record_changes,
+    change_notifier,
+    CHANGE_CREATED,
+    CHANGE_UPDATED,
+    CHANGE_DELETED
+)
+from app.services.event_service import event_hub
+from app.services.usage_service import adjust_usage, get_usage
+from app.services.search_service import index_file, unindex_files, match_file_ids
+from app.models.file import FileInfo
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Columns files can be listed by; each has a (column, id) index for keyset pagination
+SORT_COLUMNS = {
+    "created": File.created,
+    "name": File.fileName,
+    "size": File.fileSize,
+}
 
-def create_file_metadata(
+# Batches file-record inserts from concurrent uploads into shared transactions
+file_record_committer = GroupCommitter(
+    "file-records",
+    settings.GROUP_COMMIT_WINDOW_MS,
+    settings.GROUP_COMMIT_MAX_BATCH
+)
+
+
+def announce_file_changes(user_id: int, action: str, file_ids: List[int], files: Optional[List[File]] = None) -> None:
+    """After a commit, wake the user's change-feed long-polls and push the change to connected clients."""
+    change_notifier.notify([user_id])
+    data: Dict[str, object] = {"fileIds": file_ids}
+    if files is not None:
+        data["files"] = [FileInfo.model_validate(f).model_dump(mode="json") for f in files]
+    event_hub.publish(user_id, action, data)
+
+
+def add_file_record(
     db: Session,
+    user_id: int,
     fileName: str,
     fileType: str,
     fileSize: int,
-    filePath: str
+    filePath: str,
+    blobHash: Optional[str] = None,
+    contentEncoding: Optional[str] = None,
+    storedSize: Optional[int] = None
 ) -> File:
-    """Create file metadata in database."""
+    """
+    Stage a file's blob reference, metadata and user association without committing.
+
+    This is the body of the upload unit of work (including the usage counters,
+    search index and change journal entry); callers commit once, either per file
+    (create_file_record) or for a whole batch (group commit), then call
+    announce_file_changes. A blobHash comes with a reference the caller already
+    holds (from place_blob or reserve_owned_blob), which the file takes over;
+    if the record isn't committed the caller gives it back. Raises
+    QuotaExceededError if the file doesn't fit the user's quota.
+    """
+    adjust_usage(db, user_id, fileSize, 1)
     db_file = File(
         fileName=fileName,
         fileType=fileType,
         fileSize=fileSize,
-        filePath=filePath
+        filePath=filePath,
+        blobHash=blobHash,
+        contentEncoding=contentEncoding,
+        storedSize=storedSize
     )
     db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
-    logger.info(f"Created file metadata: {fileName} (id={db_file.id})")
+    db.flush()
+    db.add(UserToFileAssociation(userId=user_id, fileId=db_file.id))
+    index_file(db, db_file.id, fileName, user_id)
+    record_change(db, user_id, db_file.id, CHANGE_CREATED)
     return db_file
 
 
-def get_file_metadata_by_id(db: Session, file_id: int) -> Optional[File]:
-    """Get file metadata by ID."""
-    return db.query(File).filter(File.id == file_id).first()
+@db_write
+def create_file_record(
+    db: Session,
+    user_id: int,
+    fileName: str,
+    fileType: str,
+    fileSize: int,
+    filePath: str,
+    blobHash: Optional[str] = None,
+    contentEncoding: Optional[str] = None,
+    storedSize: Optional[int] = None
+) -> File:
+    """Create a file's blob reference, metadata and user association in one transaction."""
+    try:
+        db_file = add_file_record(
+            db, user_id, fileName, fileType, fileSize, filePath, blobHash, contentEncoding, storedSize
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    announce_file_changes(user_id, CHANGE_CREATED, [db_file.id], [db_file])
+    logger.info(f"Created file record: {fileName} (id={db_file.id}) for user_id={user_id}")
+    return db_file
+
+
+@db_write
+def create_file_records(db: Session, user_id: int, records: List[Dict[str, object]]) -> List[File]:
+    """Create several file records (as for create_file_record) in one transaction."""
+    try:
+        db_files = [add_file_record(db, user_id, **fields) for fields in records]
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    announce_file_changes(user_id, CHANGE_CREATED, [f.id for f in db_files], db_files)
+    logger.info(f"Created {len(db_files)} file records for user_id={user_id}")
+    return db_files
+
+
+async def save_file_record(db: DbSession, user_id: int, **fields) -> File:
+    """Persist a new file record, batching it with concurrent uploads when group commit is enabled."""
+    if settings.GROUP_COMMIT_ENABLED:
+        db_file = await file_record_committer.submit(add_file_record, user_id, **fields)
+        announce_file_changes(user_id, CHANGE_CREATED, [db_file.id], [db_file])
+        return db_file
+    return await run_db(db, create_file_record, user_id, **fields)
+
+
+@db_write
+def replace_file_content(
+    db: Session,
+    user_id: int,
+    file_id: int,
+    base_hash: Optional[str],
+    base_path: str,
+    fileSize: int,
+    filePath: str,
+    blobHash: str,
+    contentEncoding: Optional[str] = None,
+    storedSize: Optional[int] = None
+) -> Optional[Tuple[File, List[str]]]:
+    """
+    Point a file at new blob content, in one transaction, if it still has its base content.
+
+    The base is matched on blob hash (or file path for legacy files), so a
+    concurrent update makes this return None instead of overwriting it. Otherwise
+    returns the updated file and the hashes of blobs left unreferenced, whose
+    content should be removed with discard_blob. The file takes over the
+    caller's reference on the new blob (from place_blob), which the caller gives
+    back if this returns None or raises. Raises QuotaExceededError if the growth
+    doesn't fit the user's quota.
+    """
+    try:
+        base_size = db.query(File.fileSize).filter(File.id == file_id).scalar() or 0
+        adjust_usage(db, user_id, fileSize - base_size, 0)
+        if base_hash:
+            base_matches = File.blobHash == base_hash
+        else:
+            base_matches = and_(File.blobHash.is_(None), File.filePath == base_path)
+        updated = db.query(File).filter(
+            File.id == file_id,
+            File.deletedAt.is_(None),
+            base_matches
+        ).update(
+            {
+                File.fileSize: fileSize,
+                File.filePath: filePath,
+                File.blobHash: blobHash,
+                File.contentEncoding: contentEncoding,
+                File.storedSize: storedSize,
+                File.modified: datetime.utcnow(),
+            },
+            synchronize_session=False
+        )
+        if not updated:
+            db.rollback()
+            return None
+        unreferenced = release_blobs(db, {base_hash: 1}) if base_hash else []
+        record_change(db, user_id, file_id, CHANGE_UPDATED)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db_file = db.query(File).populate_existing().filter(File.id == file_id).first()
+    announce_file_changes(user_id, CHANGE_UPDATED, [file_id], [db_file])
+    logger.info(f"Replaced content of file_id={file_id} with blob {blobHash}")
+    return db_file, unreferenced
+
+
+def get_file_for_user(db: Session, user_id: int, file_id: int) -> Tuple[Optional[File], bool]:
+    """
+    Get file metadata and whether the user owns it, in a single joined query.
+
+    Returns (None, False) if the file does not exist.
+    """
+    row = db.query(File, UserToFileAssociation.userId).outerjoin(
+        UserToFileAssociation,
+        UserToFileAssociation.fileId == File.id
+    ).filter(
+        File.id == file_id,
+        File.deletedAt.is_(None)
+    ).first()
+    
+    if row is None:
+        return None, False
+    db_file, owner_id = row
+    return db_file, owner_id == user_id
+
+
+def get_user_files_by_ids(db: Session, user_id: int, file_ids: List[int]) -> List[File]:
+    """Get those of the given files that the user owns, in a single joined query."""
+    return db.query(File).join(
+        UserToFileAssociation,
+        File.id == UserToFileAssociation.fileId
+    ).filter(
+        UserToFileAssociation.userId == user_id,
+        File.id.in_(file_ids)
+    ).order_by(File.id).all()
 
 
 def get_user_files_count(db: Session, user_id: int) -> int:
-    """Get total count of files for a user."""
-    return db.query(UserToFileAssociation).filter(UserToFileAssociation.userId == user_id).count()
+    """Get total count of files for a user, from the materialized usage counters."""
+    return get_usage(db, user_id).fileCount
+
+
+def encode_file_cursor(file: File, sort: str, order: str) -> str:
+    """Build an opaque cursor from the last file of a page."""
+    value = getattr(file, SORT_COLUMNS[sort].key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, order, value, file.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_file_cursor(cursor: str, sort: str, order: str) -> Tuple[object, int]:
+    """Decode a cursor into (sort value, file id). Raises ValueError if invalid or from another sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_order, value, file_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if cursor_sort != sort or cursor_order != order or not isinstance(file_id, int):
+        raise ValueError("Cursor does not match the requested sort order")
+    if sort == "created":
+        value = datetime.fromisoformat(value)
+    return value, file_id
+
+
+def order_files(query: Query, sort: str, order: str, cursor: Optional[Tuple[object, int]] = None) -> Query:
+    """Order a File query by (sort column, id), starting strictly after a decoded cursor if given."""
+    column = SORT_COLUMNS[sort]
+    descending = order == "desc"
+
+    if cursor is not None:
+        value, last_id = cursor
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, File.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, File.id > last_id)))
+
+    if descending:
+        return query.order_by(column.desc(), File.id.desc())
+    return query.order_by(column.asc(), File.id.asc())
 
 
 def get_user_files(
     db: Session,
     user_id: int,
     page: int = 1,
-    page_size: int = 10
+    page_size: int = 10,
+    sort: str = "created",
+    order: str = "asc",
+    cursor: Optional[Tuple[object, int]] = None
 ) -> List[File]:
-    """Get user's files with pagination."""
-    offset = (page - 1) * page_size
-    return db.query(File).join(
+    """
+    Get user's files ordered by (sort column, id).
+
+    With a decoded cursor the page starts strictly after it (keyset pagination),
+    so deep pages cost the same as the first; otherwise page/page_size offsets are used.
+    """
+    query = db.query(File).join(
         UserToFileAssociation,
         File.id == UserToFileAssociation.fileId
     ).filter(
         UserToFileAssociation.userId == user_id
-    ).offset(offset).limit(page_size).all()
+    )
+    query = order_files(query, sort, order, cursor)
 
+    if cursor is None:
+        query = query.offset((page - 1) * page_size)
 
-def get_user_file_association(db: Session, user_id: int, file_id: int) -> Optional[UserToFileAssociation]:
-    """Get user-file association."""
-    return db.query(UserToFileAssociation).filter(
-        UserToFileAssociation.userId == user_id,
-        UserToFileAssociation.fileId == file_id
-    ).first()
+    return query.limit(page_size).all()
 
 
-def create_user_file_association(db: Session, user_id: int, file_id: int) -> UserToFileAssociation:
-    """Create user-file association."""
-    association = UserToFileAssociation(
-        userId=user_id,
-        fileId=file_id
+def search_user_files(
+    db: Session,
+    user_id: int,
+    match: Optional[str] = None,
+    file_type: Optional[str] = None,
+    min_size: Optional[int] = None,
+    max_size: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    sort: str = "created",
+    order: str = "asc",
+    cursor: Optional[Tuple[object, int]] = None,
+    limit: int = 50
+) -> List[File]:
+    """
+    Search the user's files by name and metadata, ordered by (sort column, id) with keyset pagination.
+
+    match is an FTS5 expression (see search_service.build_match_query) resolved
+    through the name index first; file_type is a MIME prefix such as "image/",
+    matched as an index range rather than LIKE.
+    """
+    query = db.query(File).join(
+        UserToFileAssociation,
+        File.id == UserToFileAssociation.fileId
+    ).filter(
+        UserToFileAssociation.userId == user_id
     )
-    db.add(association)
-    db.commit()
-    db.refresh(association)
-    logger.info(f"Created user-file association: user_id={user_id}, file_id={file_id}")
-    return association
+    if match:
+        query = query.filter(match_file_ids(match, user_id))
+    if file_type:
+        upper = file_type[:-1] + chr(ord(file_type[-1]) + 1)
+        query = query.filter(File.fileType >= file_type, File.fileType < upper)
+    if min_size is not None:
+        query = query.filter(File.fileSize >= min_size)
+    if max_size is not None:
+        query = query.filter(File.fileSize <= max_size)
+    if created_after is not None:
+        query = query.filter(File.created >= created_after)
+    if created_before is not None:
+        query = query.filter(File.created < created_before)
+    return order_files(query, sort, order, cursor).limit(limit).all()
+
+
+@db_write
+def tombstone_user_files(db: Session, user_id: int, file_ids: List[int]) -> List[int]:
+    """
+    Mark the user's files among file_ids as deleted, in one ownership query and one transaction.
 
+    Tombstoned files lose their user association immediately; the garbage collector
+    removes their content and purges the rows later. Returns the tombstoned IDs.
+    """
+    owned = db.query(File.id, File.fileSize).join(
+        UserToFileAssociation,
+        File.id == UserToFileAssociation.fileId
+    ).filter(
+        UserToFileAssociation.userId == user_id,
+        File.id.in_(file_ids),
+        File.deletedAt.is_(None)
+    ).all()
+    tombstoned_ids = [row.id for row in owned]
+    if not tombstoned_ids:
+        return []
 
-def delete_file_and_association(db: Session, file_id: int) -> bool:
-    """Delete file metadata and its association within a transaction."""
     try:
-        with db.begin_nested():
-            association = db.query(UserToFileAssociation).filter(
-                UserToFileAssociation.fileId == file_id
-            ).first()
-            
-            if association:
-                db.delete(association)
-            
-            file_metadata = db.query(File).filter(File.id == file_id).first()
-            
-            if file_metadata:
-                db.delete(file_metadata)
-                logger.info(f"Deleted file and association: file_id={file_id}")
-                return True
+        # Counters are adjusted first: a user's first adjustment computes them from the live files
+        adjust_usage(db, user_id, -sum(row.fileSize for row in owned), -len(tombstoned_ids), enforce_quota=False)
+        db.query(File).filter(File.id.in_(tombstoned_ids)).update(
+            {File.deletedAt: datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.query(UserToFileAssociation).filter(
+            UserToFileAssociation.fileId.in_(tombstoned_ids)
+        ).delete(synchronize_session=False)
+        unindex_files(db, tombstoned_ids)
+        record_changes(db, user_id, tombstoned_ids, CHANGE_DELETED)
         db.commit()
-        return False
-    except Exception as e:
+    except Exception:
         db.rollback()
-        logger.error(f"Failed to delete file and association for file_id={file_id}: {e}")
-        return False
+        raise
 
+    announce_file_changes(user_id, CHANGE_DELETED, tombstoned_ids)
+    logger.info(f"Tombstoned {len(tombstoned_ids)} files for user_id={user_id}")
+    return tombstoned_ids
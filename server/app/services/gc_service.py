@@ -0,0 +1,199 @@
+"""Garbage collection of deleted files and reconciliation of stored content."""
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, TypeVar
+
+from app.db.database import SessionLocal
+from app.db.tables import File, Blob
+from app.services.blob_service import release_blobs, discard_blob, finish_stale_deletions
+from app.services.thumbnail_service import discard_thumbnails
+from app.storage import get_storage
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Rows looked up per query when matching scanned files against the database
+RECONCILE_QUERY_BATCH = 500
+
+
+class _Throttle:
+    """Pace disk deletions to at most rate_per_second so foreground I/O isn't starved."""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1 / rate_per_second if rate_per_second > 0 else 0
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def _unlink(path: Path, throttle: _Throttle) -> None:
+    """Remove a file at the throttled rate, logging rather than raising on failure."""
+    throttle.wait()
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.error(f"Error deleting file from disk: {path} - {str(e)}")
+
+
+def collect_deleted_files() -> int:
+    """
+    Reclaim up to GC_BATCH_SIZE tombstoned files. Returns the number of rows purged.
+
+    Legacy (non-blob) content is unlinked before its row is purged, so a crash just
+    leaves a tombstone to retry. Blob references are released in the same transaction
+    as the purge, and unreferenced blobs are unlinked after it commits (unless an
+    upload referenced them again meanwhile; see discard_blob); a crash in between
+    leaves an orphan blob that reconcile_storage removes. Blob deletions a crash
+    interrupted (which block uploads of that content) are completed first.
+    """
+    throttle = _Throttle(settings.GC_UNLINKS_PER_SECOND)
+    stale = finish_stale_deletions(datetime.utcnow() - timedelta(seconds=settings.BLOB_DELETE_STALE_SECONDS))
+    if stale:
+        logger.warning(f"Completed {stale} interrupted blob deletions")
+    db = SessionLocal()
+    try:
+        rows = db.query(File.id, File.filePath, File.blobHash).filter(
+            File.deletedAt.isnot(None)
+        ).order_by(File.deletedAt).limit(settings.GC_BATCH_SIZE).all()
+        if not rows:
+            return 0
+
+        ref_counts: Dict[str, int] = {}
+        for row in rows:
+            if row.blobHash:
+                ref_counts[row.blobHash] = ref_counts.get(row.blobHash, 0) + 1
+            else:
+                _unlink(Path(row.filePath), throttle)
+                discard_thumbnails(f"file-{row.id}")
+
+        file_ids = [row.id for row in rows]
+        try:
+            db.query(File).filter(File.id.in_(file_ids)).delete(synchronize_session=False)
+            unreferenced = release_blobs(db, ref_counts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    finally:
+        db.close()
+
+    removed = 0
+    for sha256 in unreferenced:
+        throttle.wait()
+        if discard_blob(sha256):
+            discard_thumbnails(sha256)
+            removed += 1
+
+    logger.info(f"Collected {len(file_ids)} deleted files ({removed} blobs removed)")
+    return len(file_ids)
+
+
+def _scan_files(root: Path) -> Iterator[os.DirEntry]:
+    """Yield the regular files directly inside a directory."""
+    if not root.is_dir():
+        return
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield entry
+
+
+def _scan_legacy_files(root: Path) -> Iterator[os.DirEntry]:
+    """Yield pre-blob-store upload files, which live in per-user directories (<uploads>/<user_id>/...)."""
+    if not root.is_dir():
+        return
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.name.isdigit() and entry.is_dir():
+                yield from _scan_files(Path(entry.path))
+
+
+def _batched(items: List[T], size: int) -> Iterator[List[T]]:
+    """Split a list into consecutive batches."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def reconcile_storage() -> Dict[str, int]:
+    """
+    Compare blob storage and files under settings.uploads_path with the database and remove orphans.
+
+    Stored blobs with no Blob row, legacy upload files with no File row and stale
+    staging files are deleted once older than STORAGE_RECONCILE_GRACE_SECONDS (so
+    in-flight uploads are left alone). A blob's row is rechecked under the write
+    lock before its content goes, as an upload may have referenced it since it was
+    scanned. Rows whose content is missing are only reported. Returns counts of
+    what was found.
+    """
+    throttle = _Throttle(settings.GC_UNLINKS_PER_SECOND)
+    cutoff = time.time() - settings.STORAGE_RECONCILE_GRACE_SECONDS
+    stats = {
+        "orphan_blobs": 0,
+        "orphan_files": 0,
+        "stale_staging": 0,
+        "missing_blobs": 0,
+        "missing_files": 0,
+    }
+
+    db = SessionLocal()
+    try:
+        # Stored blobs without a Blob row
+        storage = get_storage()
+        stored_blobs = list(storage.iter_keys())
+        on_disk_blobs = {key for key, _ in stored_blobs}
+        for batch in _batched(stored_blobs, RECONCILE_QUERY_BATCH):
+            known = {
+                row.sha256 for row in db.query(Blob.sha256).filter(
+                    Blob.sha256.in_([key for key, _ in batch])
+                )
+            }
+            for key, modified in batch:
+                if key not in known and modified < cutoff:
+                    throttle.wait()
+                    if discard_blob(key):
+                        stats["orphan_blobs"] += 1
+
+        # Blob rows whose content is gone
+        for row in db.query(Blob.sha256).yield_per(RECONCILE_QUERY_BATCH):
+            if row.sha256 not in on_disk_blobs:
+                stats["missing_blobs"] += 1
+                logger.warning(f"Blob {row.sha256} has no content in storage")
+
+        # Legacy (pre-blob-store) upload files without a File row, and the reverse
+        legacy_entries = list(_scan_legacy_files(settings.uploads_path))
+        on_disk_files = {os.path.abspath(entry.path) for entry in legacy_entries}
+        legacy_paths = set()
+        for row in db.query(File.filePath).filter(File.blobHash.is_(None)).yield_per(RECONCILE_QUERY_BATCH):
+            path = os.path.abspath(row.filePath)
+            legacy_paths.add(path)
+            if path not in on_disk_files:
+                stats["missing_files"] += 1
+                logger.warning(f"File row points at missing content: {row.filePath}")
+        for entry in legacy_entries:
+            if os.path.abspath(entry.path) not in legacy_paths and entry.stat().st_mtime < cutoff:
+                _unlink(Path(entry.path), throttle)
+                stats["orphan_files"] += 1
+    finally:
+        db.close()
+
+    # Staged uploads abandoned mid-flight
+    for entry in _scan_files(settings.blob_staging_path):
+        if entry.stat().st_mtime < cutoff:
+            _unlink(Path(entry.path), throttle)
+            stats["stale_staging"] += 1
+
+    if any(stats.values()):
+        logger.info(f"Storage reconciliation: {stats}")
+    return stats
@@ -0,0 +1,42 @@
+"""Preview rendering, run in worker processes (kept free of app imports so workers start cheaply)."""
+import os
+import uuid
+
+PDF_TYPES = {"application/pdf"}
+
+
+def render_preview(source: str, file_type: str, size: int, destination: str, quality: int) -> None:
+    """
+    Render a JPEG preview no larger than size x size pixels.
+
+    Images are decoded at reduced scale where the format allows; PDFs are
+    rasterised from their first page. Requires Pillow (and pypdfium2 for PDFs).
+    """
+    from PIL import Image, ImageOps
+
+    if file_type in PDF_TYPES:
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(source)
+        try:
+            page = pdf[0]
+            width, height = page.get_size()
+            image = page.render(scale=size / max(width, height, 1)).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(source)
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+
+    image.thumbnail((size, size))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    temp_path = f"{destination}.{uuid.uuid4().hex}.part"
+    try:
+        image.save(temp_path, "JPEG", quality=quality, optimize=True)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
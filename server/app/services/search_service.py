@@ -0,0 +1,147 @@
+"""Search service: the SQLite FTS5 index over file names, partitioned by owner."""
+import re
+from typing import Iterable, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SEARCH_TABLE = "files_fts"
+SEARCH_COLUMNS = ("terms", "owner_id")
+
+# Rows written per transaction when backfilling the index
+BACKFILL_BATCH_SIZE = 1000
+
+# Runs of letters and digits; underscores and punctuation separate parts
+_PART_RE = re.compile(r"[^\W_]+")
+
+
+def _split_part(part: str) -> List[str]:
+    """Split one part at camelCase humps and letter/digit boundaries ("HTTPServerLog2" -> HTTP, Server, Log, 2)."""
+    pieces = []
+    start = 0
+    for i in range(1, len(part)):
+        prev, cur = part[i - 1], part[i]
+        if (
+            prev.isdigit() != cur.isdigit()
+            or (prev.islower() and cur.isupper())
+            or (prev.isupper() and cur.isupper() and i + 1 < len(part) and part[i + 1].islower())
+        ):
+            pieces.append(part[start:i])
+            start = i
+    pieces.append(part[start:])
+    return pieces
+
+
+def search_terms(file_name: str) -> str:
+    """
+    Get the text indexed for a file name.
+
+    "quarterlyReport_Q3-final.PDF" indexes as its parts (quarterlyreport, q3,
+    final, pdf) plus the words within them (quarterly, report, q, 3), so
+    extensions and camelCase fragments are each searchable.
+    """
+    words = []
+    for part in _PART_RE.findall(file_name):
+        words.append(part.lower())
+        pieces = _split_part(part)
+        if len(pieces) > 1:
+            words.extend(piece.lower() for piece in pieces)
+    return " ".join(dict.fromkeys(words))
+
+
+def _prefix(word: str) -> str:
+    """Quote a word as an FTS5 prefix query."""
+    return '"' + word.replace('"', '""') + '"*'
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn user input into an FTS5 MATCH expression, or None if it has no searchable words.
+
+    Each part must prefix-match an indexed word; a part with camelCase or digit
+    boundaries may instead match as its words ("reportQ3" finds both
+    "reportq3.txt" and "quarterlyReport_Q3.pdf").
+    """
+    clauses = []
+    for part in dict.fromkeys(_PART_RE.findall(query)):
+        pieces = _split_part(part)
+        if len(pieces) > 1:
+            words = " AND ".join(_prefix(piece.lower()) for piece in pieces)
+            clauses.append(f"({_prefix(part.lower())} OR ({words}))")
+        else:
+            clauses.append(_prefix(part.lower()))
+    return " AND ".join(clauses) or None
+
+
+def create_search_index() -> None:
+    """
+    Create the FTS5 table if needed and index files added before it existed.
+
+    FTS5 tables can't gain columns, so an index built before the owner column
+    was added is dropped and rebuilt.
+    """
+    db = SessionLocal()
+    try:
+        columns = tuple(row.name for row in db.execute(text(f"PRAGMA table_info({SEARCH_TABLE})")))
+        if columns and columns != SEARCH_COLUMNS:
+            logger.info(f"Rebuilding search index with columns {SEARCH_COLUMNS}")
+            db.execute(text(f"DROP TABLE {SEARCH_TABLE}"))
+        db.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "terms, owner_id, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+        db.commit()
+        indexed = 0
+        while True:
+            rows = db.execute(text(
+                f"SELECT files.id, files.fileName, a.userId FROM files "
+                f"JOIN user_to_file_association a ON a.fileId = files.id "
+                f"WHERE files.deletedAt IS NULL "
+                f"AND files.id NOT IN (SELECT rowid FROM {SEARCH_TABLE}) LIMIT :limit"
+            ), {"limit": BACKFILL_BATCH_SIZE}).all()
+            if not rows:
+                break
+            for row in rows:
+                index_file(db, row.id, row.fileName, row.userId)
+            db.commit()
+            indexed += len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if indexed:
+        logger.info(f"Indexed {indexed} existing files for search")
+
+
+def index_file(db: Session, file_id: int, file_name: str, owner_id: int) -> None:
+    """Add or replace a file's search entry without committing (part of the caller's transaction)."""
+    db.execute(
+        text(f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, terms, owner_id) VALUES (:id, :terms, :owner_id)"),
+        {"id": file_id, "terms": search_terms(file_name), "owner_id": str(owner_id)}
+    )
+
+
+def unindex_files(db: Session, file_ids: Iterable[int]) -> None:
+    """Remove files' search entries without committing."""
+    db.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"),
+        [{"id": file_id} for file_id in file_ids]
+    )
+
+
+def match_file_ids(match: str, user_id: int):
+    """
+    Get a SQL fragment restricting File.id to the user's files whose name matches an FTS5 expression.
+
+    The owner is an indexed token ANDed into the MATCH, so FTS5 intersects the
+    term's postings with the user's own rather than materializing every user's
+    matches and filtering them afterwards.
+    """
+    return text(f"files.id IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match)").bindparams(
+        match=f'owner_id : "{user_id}" AND terms : ({match})'
+    )
@@ -0,0 +1,142 @@
+"""Thumbnail service for generating and caching image and PDF previews."""
+import asyncio
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Set
+from starlette.concurrency import run_in_threadpool
+
+from app.db.tables import File
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.blob_service import get_local_content_path, iter_content
+from app.services.preview_renderer import render_preview, PDF_TYPES
+
+logger = get_logger(__name__)
+
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+THUMBNAIL_MEDIA_TYPE = "image/jpeg"
+
+# Rendering is CPU-bound, so it runs in worker processes created on first use
+_pool: Optional[ProcessPoolExecutor] = None
+
+# "<key>-<size>" -> render in progress, so concurrent requests share one render
+_in_flight: Dict[str, "asyncio.Future[Optional[Path]]"] = {}
+_background_tasks: Set[asyncio.Task] = set()
+
+# Sources that failed to render recently; not retried until the entry expires
+_failed: TTLCache[str, bool] = TTLCache(10000, 3600)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Get the thumbnail worker pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    return _pool
+
+
+def shutdown_thumbnail_pool() -> None:
+    """Stop the thumbnail worker processes."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def supports_preview(file: File) -> bool:
+    """Check whether a preview can be generated for a file."""
+    file_type = file.fileType.split(";")[0].strip().lower()
+    if file_type not in IMAGE_TYPES | PDF_TYPES:
+        return False
+    return file.fileSize <= settings.THUMBNAIL_MAX_SOURCE_MB * 1024 * 1024
+
+
+def get_preview_key(file: File) -> str:
+    """Get the cache key of a file's previews: its content hash, or its ID for legacy files."""
+    return file.blobHash or f"file-{file.id}"
+
+
+def get_thumbnail_path(key: str, size: int) -> Path:
+    """Get the cached preview path for a key and size."""
+    return settings.thumbnails_path / key[:2] / f"{key}-{size}.jpg"
+
+
+def discard_thumbnails(key: str) -> None:
+    """Remove every cached preview size for a key."""
+    for size in settings.THUMBNAIL_SIZES:
+        get_thumbnail_path(key, size).unlink(missing_ok=True)
+
+
+def _copy_content(file: File, destination: Path) -> None:
+    """Copy a file's content from storage to a local path."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    with open(destination, "wb") as f:
+        for chunk in iter_content(file, 0, file.fileSize):
+            f.write(chunk)
+
+
+async def _render(file: File, size: int, destination: Path) -> Optional[Path]:
+    """Render a preview in the worker pool, fetching remote content to a temp file first."""
+    file_type = file.fileType.split(";")[0].strip().lower()
+    source = get_local_content_path(file)
+    temp_source = None
+    try:
+        if source is None:
+            temp_source = settings.thumbnails_path / ".staging" / uuid.uuid4().hex
+            await run_in_threadpool(_copy_content, file, temp_source)
+            source = temp_source
+        await run_in_threadpool(destination.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.get_running_loop().run_in_executor(
+            _get_pool(),
+            render_preview,
+            str(source),
+            file_type,
+            size,
+            str(destination),
+            settings.THUMBNAIL_QUALITY
+        )
+    except Exception as e:
+        logger.warning(f"Preview generation failed for file_id={file.id}: {str(e)}")
+        _failed.set(f"{get_preview_key(file)}-{size}", True)
+        return None
+    finally:
+        if temp_source is not None:
+            temp_source.unlink(missing_ok=True)
+    logger.info(f"Generated {size}px preview for file_id={file.id}")
+    return destination
+
+
+async def get_thumbnail(file: File, size: int) -> Optional[Path]:
+    """
+    Get the cached preview of a file, generating it on first request.
+
+    Returns None if the file type isn't supported or rendering failed.
+    """
+    if not supports_preview(file):
+        return None
+    key = get_preview_key(file)
+    path = get_thumbnail_path(key, size)
+    if await run_in_threadpool(path.exists):
+        return path
+
+    flight_key = f"{key}-{size}"
+    if _failed.get(flight_key):
+        return None
+    future = _in_flight.get(flight_key)
+    if future is None:
+        future = asyncio.ensure_future(_render(file, size, path))
+        _in_flight[flight_key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(flight_key, None))
+    return await asyncio.shield(future)
+
+
+def schedule_previews(file: File) -> None:
+    """Start generating a newly uploaded file's default preview in the background."""
+    if not supports_preview(file):
+        return
+    task = asyncio.ensure_future(get_thumbnail(file, settings.THUMBNAIL_DEFAULT_SIZE))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
@@ -0,0 +1,119 @@
+"""Upload service for streaming file bytes to disk."""
+import hashlib
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import Counter, Histogram
+
+logger = get_logger(__name__)
+
+disk_write_duration = Histogram(
+    "upload_disk_write_duration_seconds",
+    "Time per streamed upload spent writing, closing and renaming its file (excludes waiting for the client)."
+)
+disk_write_bytes = Counter("upload_disk_write_bytes_total", "Bytes of streamed uploads written to disk.")
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File exceeds maximum size of {max_bytes} bytes")
+
+
+@dataclass
+class StoredUpload:
+    """Result of streaming an upload to its final location."""
+    path: Path
+    size: int
+    sha256: Optional[str] = None
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yield an UploadFile's content in bounded chunks."""
+    chunk_size = chunk_size or settings.upload_chunk_size_bytes
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _discard(path: Path) -> None:
+    """Remove a partially written file, ignoring missing files."""
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+async def stream_to_disk(
+    chunks: AsyncIterator[bytes],
+    destination: Path,
+    max_bytes: Optional[int] = None,
+    compute_hash: bool = False
+) -> StoredUpload:
+    """
+    Stream chunks into a temp file next to destination, then atomically rename it.
+
+    Writes happen in the threadpool so the event loop is never blocked on disk I/O.
+    Size (and optionally SHA-256) is computed as bytes arrive, and the upload is
+    aborted as soon as max_bytes is exceeded.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256() if compute_hash else None
+    size = 0
+    write_seconds = 0.0
+
+    buffer = await run_in_threadpool(open, temp_path, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise FileTooLargeError(max_bytes)
+            if hasher is not None:
+                hasher.update(chunk)
+            start = time.perf_counter()
+            await run_in_threadpool(buffer.write, chunk)
+            write_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(os.replace, temp_path, destination)
+        write_seconds += time.perf_counter() - start
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(_discard, temp_path)
+        raise
+
+    disk_write_duration.observe(write_seconds)
+    disk_write_bytes.inc(amount=size)
+    logger.debug(f"Streamed {size} bytes to {destination}")
+    return StoredUpload(
+        path=destination,
+        size=size,
+        sha256=hasher.hexdigest() if hasher is not None else None
+    )
+
+
+async def save_upload_file(
+    file: UploadFile,
+    destination: Path,
+    compute_hash: bool = False
+) -> StoredUpload:
+    """Stream an UploadFile to destination, enforcing the configured size limit."""
+    return await stream_to_disk(
+        iter_upload_file(file),
+        destination,
+        max_bytes=settings.max_file_size_bytes,
+        compute_hash=compute_hash
+    )
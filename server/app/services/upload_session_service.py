@@ -0,0 +1,169 @@
+"""Upload session service for resumable, chunked uploads."""
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, List
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal, db_write
+from app.db.tables import UploadSession
+from app.models.upload_session import UploadSessionCreate
+from app.services.upload_service import StoredUpload
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SUFFIX = ".chunk"
+
+
+def get_session_dir(session_id: str) -> Path:
+    """Get the staging directory holding a session's chunks."""
+    return settings.upload_sessions_path / session_id
+
+
+def get_chunk_path(session_id: str, index: int) -> Path:
+    """Get the staging path of a numbered chunk."""
+    return get_session_dir(session_id) / f"{index}{CHUNK_SUFFIX}"
+
+
+def get_total_chunks(upload_session: UploadSession) -> int:
+    """Get the number of chunks a session expects."""
+    return -(-upload_session.fileSize // upload_session.chunkSize)
+
+
+def get_expected_chunk_size(upload_session: UploadSession, index: int) -> int:
+    """Get the exact byte size expected for a chunk index."""
+    offset = index * upload_session.chunkSize
+    return min(upload_session.chunkSize, upload_session.fileSize - offset)
+
+
+@db_write
+def create_upload_session(db: Session, user_id: int, data: UploadSessionCreate) -> UploadSession:
+    """Create a new upload session and its staging directory."""
+    chunk_size = data.chunkSize or settings.UPLOAD_SESSION_CHUNK_SIZE_MB * 1024 * 1024
+    upload_session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        fileName=data.fileName,
+        fileType=data.fileType,
+        fileSize=data.fileSize,
+        chunkSize=chunk_size,
+        expiry=datetime.utcnow() + timedelta(hours=settings.UPLOAD_SESSION_EXPIRE_HOURS)
+    )
+    db.add(upload_session)
+    db.commit()
+    db.refresh(upload_session)
+    logger.info(f"Created upload session: {upload_session.id} for user_id={user_id}")
+    return upload_session
+
+
+def get_upload_session(db: Session, session_id: str, user_id: int) -> Optional[UploadSession]:
+    """Get an unexpired upload session owned by a user."""
+    return db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user_id,
+        UploadSession.expiry > datetime.utcnow()
+    ).first()
+
+
+def get_received_chunks(upload_session: UploadSession) -> List[int]:
+    """List indexes of chunks fully stored for a session, read from the staging directory."""
+    received = []
+    try:
+        with os.scandir(get_session_dir(upload_session.id)) as entries:
+            for entry in entries:
+                if entry.name.endswith(CHUNK_SUFFIX) and entry.is_file():
+                    received.append(int(entry.name[:-len(CHUNK_SUFFIX)]))
+    except FileNotFoundError:
+        return []
+    return sorted(received)
+
+
+@db_write
+def claim_upload_session(db: Session, upload_session: UploadSession) -> bool:
+    """Atomically move a session from open to committing. Returns False if already claimed."""
+    claimed = db.query(UploadSession).filter(
+        UploadSession.id == upload_session.id,
+        UploadSession.status == "open"
+    ).update({UploadSession.status: "committing"}, synchronize_session=False)
+    db.commit()
+    db.refresh(upload_session)
+    return claimed == 1
+
+
+@db_write
+def release_upload_session(db: Session, upload_session: UploadSession) -> None:
+    """Return a claimed session to the open state after a failed commit."""
+    upload_session.status = "open"
+    db.commit()
+
+
+def assemble_upload_session(upload_session: UploadSession, destination: Path) -> StoredUpload:
+    """
+    Concatenate a session's chunks into destination, hashing them in the same pass.
+
+    Chunks are copied through a bounded buffer into a temp file which is atomically
+    renamed into place, so memory use does not depend on the file size.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256()
+    buffer = bytearray(settings.upload_chunk_size_bytes)
+    view = memoryview(buffer)
+    size = 0
+    try:
+        with open(temp_path, "wb") as dst:
+            for index in range(get_total_chunks(upload_session)):
+                with open(get_chunk_path(upload_session.id, index), "rb", buffering=0) as src:
+                    while True:
+                        n = src.readinto(buffer)
+                        if not n:
+                            break
+                        hasher.update(view[:n])
+                        dst.write(view[:n])
+                        size += n
+        os.replace(temp_path, destination)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    logger.info(f"Assembled upload session {upload_session.id} into {destination}")
+    return StoredUpload(path=destination, size=size, sha256=hasher.hexdigest())
+
+
+@db_write
+def delete_upload_session(db: Session, upload_session: UploadSession) -> None:
+    """Delete a session row. Its staged chunks are removed with discard_session_chunks."""
+    db.delete(upload_session)
+    db.commit()
+    logger.info(f"Deleted upload session: {upload_session.id}")
+
+
+def discard_session_chunks(session_id: str) -> None:
+    """Remove a session's staging directory and chunks."""
+    shutil.rmtree(get_session_dir(session_id), ignore_errors=True)
+
+
+def reap_expired_upload_sessions() -> int:
+    """Delete expired sessions and their staged chunks. Returns the number reaped."""
+    db = SessionLocal()
+    try:
+        expired = db.query(UploadSession.id).filter(UploadSession.expiry <= datetime.utcnow()).all()
+        session_ids = [row.id for row in expired]
+        if session_ids:
+            db.query(UploadSession).filter(
+                UploadSession.id.in_(session_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+    finally:
+        db.close()
+
+    for session_id in session_ids:
+        discard_session_chunks(session_id)
+
+    if session_ids:
+        logger.info(f"Reaped {len(session_ids)} expired upload sessions")
+    return len(session_ids)
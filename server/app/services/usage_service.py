@@ -0,0 +1,172 @@
+"""Usage service: materialized per-user storage counters and quota enforcement."""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db.database import SessionLocal, begin_write
+from app.db.tables import File, User, UserToFileAssociation, UserUsage
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Users whose usage is recomputed per reconciliation transaction (which holds the write lock)
+RECONCILE_BATCH_SIZE = 100
+
+
+class QuotaExceededError(Exception):
+    """Raised when a write would take a user over their storage quota."""
+
+
+@dataclass
+class Usage:
+    """A user's storage usage and quota (0 = unlimited)."""
+    bytesUsed: int
+    fileCount: int
+    quotaBytes: int
+    quotaFiles: int
+
+    @property
+    def bytesRemaining(self) -> Optional[int]:
+        """Bytes left before the quota, or None if unlimited."""
+        if not self.quotaBytes:
+            return None
+        return max(self.quotaBytes - self.bytesUsed, 0)
+
+    def allows(self, bytes_delta: int, count_delta: int = 0) -> bool:
+        """Check whether adding bytes_delta bytes and count_delta files stays within quota."""
+        if self.quotaBytes and bytes_delta > 0 and self.bytesUsed + bytes_delta > self.quotaBytes:
+            return False
+        if self.quotaFiles and count_delta > 0 and self.fileCount + count_delta > self.quotaFiles:
+            return False
+        return True
+
+
+def compute_usage(db: Session, user_id: int) -> Tuple[int, int]:
+    """Compute a user's (bytes, file count) from the files themselves (O(files); for reconciliation)."""
+    row = db.query(
+        func.coalesce(func.sum(File.fileSize), 0),
+        func.count(File.id)
+    ).join(
+        UserToFileAssociation,
+        File.id == UserToFileAssociation.fileId
+    ).filter(
+        UserToFileAssociation.userId == user_id,
+        File.deletedAt.is_(None)
+    ).one()
+    return int(row[0]), int(row[1])
+
+
+def get_usage(db: Session, user_id: int) -> Usage:
+    """Get a user's usage from the materialized counters (a primary-key lookup)."""
+    row = db.query(UserUsage.bytesUsed, UserUsage.fileCount).filter(UserUsage.userId == user_id).first()
+    # Users with no counter row yet (created before counters existed) are computed once
+    bytes_used, file_count = (row.bytesUsed, row.fileCount) if row else compute_usage(db, user_id)
+    return Usage(bytes_used, file_count, settings.user_quota_bytes, settings.USER_QUOTA_FILES)
+
+
+def adjust_usage(db: Session, user_id: int, bytes_delta: int, count_delta: int, enforce_quota: bool = True) -> None:
+    """
+    Apply a change to a user's counters as part of the caller's transaction (no commit).
+
+    Growth is checked against the quota in the same conditional UPDATE that
+    applies it, so concurrent uploads can't overshoot; raises QuotaExceededError
+    (the caller rolls back).
+    """
+    if not db.query(UserUsage.userId).filter(UserUsage.userId == user_id).first():
+        bytes_used, file_count = compute_usage(db, user_id)
+        db.execute(sqlite_insert(UserUsage).values(
+            userId=user_id,
+            bytesUsed=bytes_used,
+            fileCount=file_count
+        ).on_conflict_do_nothing())
+
+    query = db.query(UserUsage).filter(UserUsage.userId == user_id)
+    if enforce_quota:
+        if settings.user_quota_bytes and bytes_delta > 0:
+            query = query.filter(UserUsage.bytesUsed + bytes_delta <= settings.user_quota_bytes)
+        if settings.USER_QUOTA_FILES and count_delta > 0:
+            query = query.filter(UserUsage.fileCount + count_delta <= settings.USER_QUOTA_FILES)
+    updated = query.update(
+        {
+            UserUsage.bytesUsed: UserUsage.bytesUsed + bytes_delta,
+            UserUsage.fileCount: UserUsage.fileCount + count_delta,
+        },
+        synchronize_session=False
+    )
+    if not updated:
+        raise QuotaExceededError(f"Storage quota exceeded for user_id={user_id}")
+
+
+def reconcile_usage() -> int:
+    """
+    Recompute every user's counters from their files and fix any drift.
+
+    Returns the number of users corrected. Counters can only drift through bugs
+    or manual edits, so corrections are logged. Each batch is read and fixed in
+    one transaction holding the write lock, so an upload committing in between
+    can't have its adjustment overwritten by a stale total.
+    """
+    corrected = 0
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            begin_write(db)
+            user_ids = [
+                row.id for row in db.query(User.id).filter(User.id > last_id)
+                .order_by(User.id).limit(RECONCILE_BATCH_SIZE)
+            ]
+            if not user_ids:
+                db.rollback()
+                break
+            last_id = user_ids[-1]
+
+            actual: Dict[int, Tuple[int, int]] = {user_id: (0, 0) for user_id in user_ids}
+            for row in db.query(
+                UserToFileAssociation.userId,
+                func.coalesce(func.sum(File.fileSize), 0),
+                func.count(File.id)
+            ).join(
+                File,
+                File.id == UserToFileAssociation.fileId
+            ).filter(
+                UserToFileAssociation.userId.in_(user_ids),
+                File.deletedAt.is_(None)
+            ).group_by(UserToFileAssociation.userId):
+                actual[row[0]] = (int(row[1]), int(row[2]))
+
+            stored = {
+                row.userId: (row.bytesUsed, row.fileCount)
+                for row in db.query(UserUsage).filter(UserUsage.userId.in_(user_ids))
+            }
+            for user_id, (bytes_used, file_count) in actual.items():
+                if stored.get(user_id) == (bytes_used, file_count):
+                    continue
+                if user_id in stored:
+                    logger.warning(
+                        f"Usage drift for user_id={user_id}: stored {stored[user_id]}, "
+                        f"actual {(bytes_used, file_count)}"
+                    )
+                stmt = sqlite_insert(UserUsage).values(
+                    userId=user_id,
+                    bytesUsed=bytes_used,
+                    fileCount=file_count
+                )
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=[UserUsage.userId],
+                    set_={"bytesUsed": bytes_used, "fileCount": file_count}
+                ))
+                corrected += 1
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if corrected:
+        logger.info(f"Reconciled storage usage for {corrected} users")
+    return corrected
@@ -2,6 +2,7 @@
 from sqlalchemy.orm import Session
 from typing import Optional
 
+from app.db.database import db_write
 from app.db.tables import User
 from app.models.user import UserCreate
 from app.core.logging import get_logger
@@ -19,6 +20,7 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.userName == username).first()
 
 
+@db_write
 def create_user(db: Session, user_data: UserCreate, hashed_password: str) -> User:
     """Create a new user with hashed password."""
     db_user = User(
@@ -32,3 +34,14 @@ def create_user(db: Session, user_data: UserCreate, hashed_password: str) -> Use
     logger.info(f"Created new user: {user_data.userName}")
     return db_user
 
+
+
+@db_write
+def update_user_password(db: Session, user_id: int, hashed_password: str) -> None:
+    """Replace a user's password hash."""
+    db_user = get_user_by_id(db, user_id)
+    if db_user is None:
+        return
+    db_user.password = hashed_password
+    db.commit()
+    logger.info(f"Updated password hash for user_id={user_id}")
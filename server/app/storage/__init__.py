@@ -0,0 +1,32 @@
+"""Pluggable blob storage backends."""
+from functools import lru_cache
+
+from app.storage.base import StorageBackend
+from app.storage.local import LocalStorageBackend
+from app.core.config import settings
+
+
+@lru_cache()
+def get_storage() -> StorageBackend:
+    """Get the configured storage backend. Created once per process."""
+    if settings.STORAGE_BACKEND == "s3":
+        from app.storage.s3 import S3StorageBackend
+        return S3StorageBackend(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            fanout_levels=settings.STORAGE_FANOUT_LEVELS,
+            part_size=settings.S3_PART_SIZE_MB * 1024 * 1024,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY
+        )
+    return LocalStorageBackend(
+        root=settings.blobs_path,
+        fanout_levels=settings.STORAGE_FANOUT_LEVELS,
+        max_concurrency=settings.LOCAL_STORAGE_MAX_CONCURRENCY
+    )
+
+
+__all__ = ["StorageBackend", "LocalStorageBackend", "get_storage"]
@@ -0,0 +1,83 @@
+"""Storage backend interface for blob content."""
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def fanout_key(key: str, levels: int, width: int = 2) -> str:
+    """Spread keys over nested directories by hash prefix (ab/cd/abcd... for two levels)."""
+    parts = [key[i * width:(i + 1) * width] for i in range(levels)]
+    return "/".join(parts + [key])
+
+
+class StorageBackend(ABC):
+    """
+    Stores blob content by key (its SHA-256).
+
+    Calls are blocking and meant to run in the threadpool. Each call, and each chunk
+    fetched by read_range, holds one of max_concurrency slots, so a slow backend
+    can't tie up every worker thread.
+    """
+
+    name = "base"
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(max_concurrency, 1)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def put(self, key: str, source: Path) -> str:
+        """Move a staged file into storage under key, returning its locator. Consumes source."""
+        with self._slots:
+            return self._put(key, source)
+
+    def exists(self, key: str) -> bool:
+        """Check whether content is stored under key."""
+        with self._slots:
+            return self._exists(key)
+
+    def read_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        """Yield bytes [start, end) of the content under key in chunks of at most chunk_size."""
+        chunks = self._read_range(key, start, end, chunk_size)
+        try:
+            while True:
+                with self._slots:
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            chunks.close()
+
+    def delete(self, key: str) -> None:
+        """Remove the content under key, if present."""
+        with self._slots:
+            self._delete(key)
+
+    @abstractmethod
+    def locator(self, key: str) -> str:
+        """Get a human-readable location for key (stored as File.filePath)."""
+
+    @abstractmethod
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        """Yield (key, modified unix time) for everything stored, for reconciliation."""
+
+    @abstractmethod
+    def _put(self, key: str, source: Path) -> str:
+        ...
+
+    @abstractmethod
+    def _exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def _read_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        ...
+
+    @abstractmethod
+    def _delete(self, key: str) -> None:
+        ...
@@ -0,0 +1,72 @@
+"""Local filesystem storage backend."""
+import os
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from app.storage.base import StorageBackend, fanout_key
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class LocalStorageBackend(StorageBackend):
+    """Blobs as files under root, spread over fanout_levels of hash-prefix directories."""
+
+    name = "local"
+
+    def __init__(self, root: Path, fanout_levels: int, max_concurrency: int):
+        super().__init__(max_concurrency)
+        self.root = root
+        self.fanout_levels = fanout_levels
+
+    def path_for(self, key: str) -> Path:
+        """Get the on-disk path of a key."""
+        return self.root / fanout_key(key, self.fanout_levels)
+
+    def locator(self, key: str) -> str:
+        return str(self.path_for(key))
+
+    def _put(self, key: str, source: Path) -> str:
+        path = self.path_for(key)
+        if path.exists():
+            source.unlink(missing_ok=True)
+            logger.info(f"Deduplicated upload against existing blob {key}")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source, path)
+            logger.info(f"Stored new blob {key}")
+        return str(path)
+
+    def _exists(self, key: str) -> bool:
+        return self.path_for(key).exists()
+
+    def _read_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        with open(self.path_for(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def _delete(self, key: str) -> None:
+        self.path_for(key).unlink(missing_ok=True)
+        logger.info(f"Removed blob {key}")
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        yield from self._scan(self.root, self.fanout_levels)
+
+    def _scan(self, directory: Path, depth: int) -> Iterator[Tuple[str, float]]:
+        """Walk depth levels of fan-out directories, skipping dot-directories such as staging."""
+        if not directory.is_dir():
+            return
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if depth > 0 and entry.is_dir():
+                    yield from self._scan(Path(entry.path), depth - 1)
+                elif depth == 0 and entry.is_file():
+                    yield entry.name, entry.stat().st_mtime
@@ -0,0 +1,139 @@
+"""S3-compatible object storage backend (AWS S3, MinIO, moto, ...)."""
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from app.storage.base import StorageBackend, fanout_key
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    Blobs as objects under prefix, with the same hash fan-out as local storage.
+
+    Large blobs are sent with multipart upload in part_size pieces and downloads use
+    ranged GETs, so neither side ever buffers a whole file. Requires boto3.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str,
+        fanout_levels: int,
+        part_size: int,
+        max_concurrency: int,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None
+    ):
+        super().__init__(max_concurrency)
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install 'dropbox[s3]')") from e
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.fanout_levels = fanout_levels
+        self.part_size = part_size
+        self._client_error = ClientError
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(max_pool_connections=self.max_concurrency)
+        )
+
+    def object_key(self, key: str) -> str:
+        """Get the object key of a blob."""
+        return self.prefix + fanout_key(key, self.fanout_levels)
+
+    def locator(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self.object_key(key)}"
+
+    def _put(self, key: str, source: Path) -> str:
+        try:
+            if self._exists(key):
+                logger.info(f"Deduplicated upload against existing blob {key}")
+            elif source.stat().st_size <= self.part_size:
+                with open(source, "rb") as f:
+                    self._client.put_object(Bucket=self.bucket, Key=self.object_key(key), Body=f)
+                logger.info(f"Stored new blob {key}")
+            else:
+                self._put_multipart(key, source)
+                logger.info(f"Stored new blob {key} (multipart)")
+        finally:
+            source.unlink(missing_ok=True)
+        return self.locator(key)
+
+    def _put_multipart(self, key: str, source: Path) -> None:
+        """Upload a file in part_size parts, aborting the upload on failure."""
+        object_key = self.object_key(key)
+        upload_id = self._client.create_multipart_upload(Bucket=self.bucket, Key=object_key)["UploadId"]
+        try:
+            parts = []
+            with open(source, "rb") as f:
+                part_number = 1
+                while True:
+                    data = f.read(self.part_size)
+                    if not data:
+                        break
+                    response = self._client.upload_part(
+                        Bucket=self.bucket,
+                        Key=object_key,
+                        UploadId=upload_id,
+                        PartNumber=part_number,
+                        Body=data
+                    )
+                    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+                    part_number += 1
+            self._client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self._client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+            raise
+
+    def _exists(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def _read_range(self, key: str, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+        if end <= start:
+            return
+        response = self._client.get_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Range=f"bytes={start}-{end - 1}"
+        )
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def _delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        logger.info(f"Removed blob {key}")
+
+    def iter_keys(self) -> Iterator[Tuple[str, float]]:
+        paginator = self._client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"].rsplit("/", 1)[-1], obj["LastModified"].timestamp()
@@ -0,0 +1,115 @@
+"""
+Benchmark upload/list throughput under concurrent load for each SQLite profile.
+
+Runs the real FastAPI app in-process (httpx ASGI transport) against a fresh
+database per profile, with many concurrent clients each uploading small files
+and listing them. Usage (from the server directory):
+
+    python -m benchmarks.sqlite_profile --clients 32 --ops 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROFILES = {
+    "default": {"SQLITE_PROFILE": "default", "SQLITE_SINGLE_WRITER": "false"},
+    "performance": {"SQLITE_PROFILE": "performance", "SQLITE_SINGLE_WRITER": "true"},
+    "group-commit": {
+        "SQLITE_PROFILE": "performance",
+        "SQLITE_SINGLE_WRITER": "true",
+        "GROUP_COMMIT_ENABLED": "true",
+    },
+}
+
+
+async def _run_workload(clients: int, ops: int) -> dict:
+    """Drive the app with concurrent upload+list clients and collect throughput."""
+    import httpx
+    from main import app
+    from app.db.database import init_db
+
+    init_db()
+    transport = httpx.ASGITransport(app=app)
+    errors = 0
+    uploads = 0
+    lists = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login(i: int) -> dict:
+            user = {"displayName": f"Bench {i}", "userName": f"bench{i}", "password": "benchpass"}
+            await client.post("/api/auth/register", json=user)
+            r = await client.post("/api/auth/login", json={"userName": user["userName"], "password": user["password"]})
+            return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        headers = await asyncio.gather(*(login(i) for i in range(clients)))
+
+        async def worker(i: int) -> None:
+            nonlocal errors, uploads, lists
+            for n in range(ops):
+                files = {"file": (f"f{n}.txt", os.urandom(4096), "text/plain")}
+                r = await client.post("/api/files/upload", files=files, headers=headers[i])
+                if r.status_code == 201:
+                    uploads += 1
+                else:
+                    errors += 1
+                r = await client.get("/api/files/", params={"page_size": 50}, headers=headers[i])
+                if r.status_code == 200:
+                    lists += 1
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "uploads_per_s": round(uploads / elapsed, 1),
+        "lists_per_s": round(lists / elapsed, 1),
+        "errors": errors,
+    }
+
+
+def _run_profile(profile: str, clients: int, ops: int) -> dict:
+    """Run the workload in a fresh interpreter configured for one profile."""
+    workdir = tempfile.mkdtemp(prefix=f"bench-{profile}-")
+    env = {
+        **os.environ,
+        **PROFILES[profile],
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret-key"),
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "UPLOADS_DIR": f"{workdir}/uploads",
+    }
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.sqlite_profile", "--worker", "--clients", str(clients), "--ops", str(ops)],
+        cwd=server_dir, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=25)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(asyncio.run(_run_workload(args.clients, args.ops))))
+        return
+
+    print(f"{args.clients} concurrent clients x {args.ops} (upload + list) each")
+    for profile in PROFILES:
+        print(f"{profile:>12}: {_run_profile(profile, args.clients, args.ops)}")
+
+
+if __name__ == "__main__":
+    main()
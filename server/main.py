@@ -1,13 +1,27 @@
 """FastAPI application entry point."""
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-from app.api import auth, files
+from app.api import auth, events, files, upload_sessions
 from app.db.database import init_db
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, registry
+from app.core.tasks import start_periodic_task, stop_background_tasks
 from app.core.logging import setup_logging, get_logger
+from app.services.upload_session_service import reap_expired_upload_sessions
+from app.services.gc_service import collect_deleted_files, reconcile_storage
+from app.services.thumbnail_service import shutdown_thumbnail_pool
+from app.services.archive_service import shutdown_archive_pool
+from app.services.change_service import change_notifier, prune_changes
+from app.services.event_service import event_hub
+from app.services.usage_service import reconcile_usage
+from app.services.search_service import create_search_index
+from app.services.admission_service import UploadAdmissionMiddleware, upload_admission
+from app.services.auth_service import get_principal_cache_stats, reap_expired_refresh_tokens
+from app.core.security import get_password_pool_stats
 
 # Setup logging first
 setup_logging()
@@ -20,7 +34,39 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting application...")
     init_db()
+    create_search_index()
     settings.uploads_path.mkdir(parents=True, exist_ok=True)
+    settings.upload_sessions_path.mkdir(parents=True, exist_ok=True)
+    start_periodic_task(
+        "upload-session-reaper",
+        settings.UPLOAD_SESSION_REAP_INTERVAL_SECONDS,
+        reap_expired_upload_sessions
+    )
+    start_periodic_task(
+        "refresh-token-reaper",
+        settings.SESSION_REAP_INTERVAL_SECONDS,
+        reap_expired_refresh_tokens
+    )
+    start_periodic_task(
+        "deleted-file-collector",
+        settings.GC_INTERVAL_SECONDS,
+        collect_deleted_files
+    )
+    start_periodic_task(
+        "storage-reconciler",
+        settings.STORAGE_RECONCILE_INTERVAL_SECONDS,
+        reconcile_storage
+    )
+    start_periodic_task(
+        "usage-reconciler",
+        settings.USAGE_RECONCILE_INTERVAL_SECONDS,
+        reconcile_usage
+    )
+    start_periodic_task(
+        "change-feed-pruner",
+        settings.CHANGE_FEED_PRUNE_INTERVAL_SECONDS,
+        prune_changes
+    )
     logger.info(f"✓ Database initialized: {settings.DATABASE_URL}")
     logger.info(f"✓ Uploads directory: {settings.uploads_path.absolute()}")
     logger.info(f"✓ Server running on {settings.HOST}:{settings.PORT}")
@@ -29,6 +75,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down application...")
+    await stop_background_tasks()
+    shutdown_thumbnail_pool()
+    shutdown_archive_pool()
 
 
 app = FastAPI(
@@ -38,6 +87,9 @@ app = FastAPI(
     description="A RESTful API for file storage and management with JWT authentication"
 )
 
+# Upload admission control (added first so CORS headers wrap its rejections)
+app.add_middleware(UploadAdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -47,9 +99,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics (added last so latency covers every other middleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(files.router)
+app.include_router(upload_sessions.router)
+app.include_router(events.router)
 
 
 @app.get("/", tags=["Health"])
@@ -64,6 +122,24 @@ def root():
     }
 
 
+@app.get("/stats", tags=["Health"])
+def stats():
+    """Per-process cache statistics for capacity tuning."""
+    return {
+        "principal_cache": get_principal_cache_stats(),
+        "password_pool": get_password_pool_stats(),
+        "change_feed_waiters": change_notifier.waiter_count(),
+        "event_streams": event_hub.stats(),
+        "upload_admission": upload_admission.stats()
+    }
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics():
+    """Process metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     uvicorn.run(
         app,
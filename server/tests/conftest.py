@@ -0,0 +1,4 @@
+"""Test configuration: settings the app requires before it can be imported."""
+import os
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key-that-is-at-least-32-bytes")